@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from . import invoices
 from .models import Doctor,Patient,Appointment,PatientDischargeDetails
-from .models import Patient, Doctor, MedicalRecord
+from .models import Patient, Doctor, MedicalRecord, OutgoingEmail
 
 
 # Register your models here.
@@ -17,7 +20,22 @@ class AppointmentAdmin(admin.ModelAdmin):
 admin.site.register(Appointment, AppointmentAdmin)
 
 class PatientDischargeDetailsAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('patientName', 'assignedDoctorName', 'admitDate', 'releaseDate', 'total')
+    list_filter = ('releaseDate',)
+    date_hierarchy = 'releaseDate'
+    actions = ['export_invoices']
+
+    @admin.action(description="Download invoices of selected discharges (ZIP)")
+    def export_invoices(self, request, queryset):
+        # Discharges without a bill for their stay are counted in the archive's UNBILLED.txt
+        stats = {}
+        response = StreamingHttpResponse(
+            invoices.stream_invoice_zip(invoices.export_jobs(queryset, stats=stats),
+                                        workers=invoices.ADMIN_EXPORT_WORKERS, stats=stats),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = 'attachment; filename="invoices.zip"'
+        return response
 admin.site.register(PatientDischargeDetails, PatientDischargeDetailsAdmin)
 
 @admin.register(MedicalRecord)
@@ -25,4 +43,18 @@ class MedicalRecordAdmin(admin.ModelAdmin):
     list_display = ('record_id', 'patient', 'doctor', 'diagnosis', 'created_at')
     list_filter = ('created_at', 'patient', 'doctor')
     search_fields = ('record_id', 'diagnosis', 'prescribed_treatment')
-    raw_id_fields = ('patient', 'doctor')
\ No newline at end of file
+    raw_id_fields = ('patient', 'doctor')
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('claimed_by', 'claimed_at', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+
+    @admin.action(description="Send selected emails again on the next worker pass")
+    def retry_now(self, request, queryset):
+        # Rows being sent are left to their worker; requeuing them would send them twice
+        queryset.exclude(status__in=[OutgoingEmail.SENT, OutgoingEmail.SENDING]).update(
+            status=OutgoingEmail.PENDING, attempts=0, next_attempt_at=timezone.now(), claimed_by='',
+        )
@@ -0,0 +1,150 @@
+# hospital/caching.py
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+
+from . import replicas
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'HOSPITAL_PAGE_CACHE_TIMEOUT', 600)
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'HOSPITAL_FRAGMENT_CACHE_TIMEOUT', 600)
+# Longest a per-process (locmem) cache keeps data whose invalidation only reaches the worker
+# that made the change
+LOCAL_CACHE_TIMEOUT = getattr(settings, 'HOSPITAL_LOCAL_CACHE_TIMEOUT', 5)
+
+
+def is_shared():
+    """Whether all workers use one cache, so an invalidation in one of them reaches the others."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def shared_timeout(timeout):
+    """
+    ``timeout``, cut to LOCAL_CACHE_TIMEOUT when each process has a cache of its own.
+
+    For data that signals invalidate, such as roles or the medicine catalogue:
+    under locmem the invalidation only reaches the worker that made the change,
+    so the others must not keep their copy for the full timeout.
+    """
+    return timeout if is_shared() else min(timeout, LOCAL_CACHE_TIMEOUT)
+
+
+class CacheStats:
+    """Hit and miss counters per cache group, kept in process memory like the request metrics."""
+
+    def __init__(self):
+        self._counts = defaultdict(lambda: [0, 0])
+        self._lock = threading.Lock()
+
+    def record(self, group, hit):
+        with self._lock:
+            self._counts[group][0 if hit else 1] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+    def summary(self):
+        """[{group, hits, misses, hit_rate}] sorted by group name."""
+        with self._lock:
+            snapshot = {group: tuple(counts) for group, counts in self._counts.items()}
+        rows = []
+        for group, (hits, misses) in sorted(snapshot.items()):
+            rows.append({
+                'group': group,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(100 * hits / (hits + misses), 1) if hits + misses else None,
+            })
+        return rows
+
+
+stats = CacheStats()
+
+
+def get(key, group):
+    """cache.get() that counts a hit or a miss for ``group``."""
+    value = cache.get(key)
+    stats.record(group, value is not None)
+    return value
+
+
+# Generation counters: fragments embed the current generation of the data they show in
+# their key, and model signals bump it, so a change retires every dependent fragment at
+# once without knowing their keys
+
+def _generation_key(name):
+    return f"hospital:generation:{name}"
+
+
+def generation(name):
+    key = _generation_key(name)
+    value = cache.get(key)
+    if value is None:
+        # Start from the clock so a counter that was evicted never comes back at a
+        # value that fragments cached before the eviction still carry
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump(*names):
+    def _bump():
+        for name in names:
+            try:
+                cache.incr(_generation_key(name))
+            except ValueError:
+                # Nothing has been cached under this generation yet
+                cache.add(_generation_key(name), time.time_ns(), None)
+    # After commit, so no reader caches a fragment of the data being replaced
+    transaction.on_commit(_bump)
+
+
+def fragment(name, generations, vary_on, render):
+    """
+    Return the cached fragment ``name`` for the current ``generations``, rendering it on a miss.
+
+    A fragment rendered from the read replica is not stored: the replica can
+    still lag behind the change that bumped the generation, and the old rows
+    would be cached under the new one.
+    """
+    versions = [f"{generation_name}.{generation(generation_name)}" for generation_name in generations]
+    # A missing value keys as '' rather than 'None', which a search for "None" would share
+    varies = [f"vary:{'' if value is None else value}" for value in vary_on]
+    key = make_template_fragment_key(f"hospital:{name}", versions + varies)
+    content = get(key, f"fragment:{name}")
+    if content is None:
+        content = render()
+        if not replicas.reading_from_replica():
+            cache.set(key, content, FRAGMENT_CACHE_TIMEOUT)
+    return content
+
+
+def cache_anonymous_page(view):
+    """
+    Serve a public page from cache to anonymous visitors.
+
+    Logged-in users always reach the view, since these pages redirect them
+    to their dashboard. Only complete 200 responses are stored, one per
+    theme, since the navbar renders the visitor's 'mode' cookie.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        # Only the value the navbar tests is keyed on, so arbitrary cookies cannot fill the cache
+        theme = 'dark' if request.COOKIES.get('mode') == 'dark' else 'light'
+        key = f"hospital:page:{theme}:{request.get_full_path()}"
+        response = get(key, 'pages')
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, response, PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
@@ -0,0 +1,35 @@
+# hospital/catalogue.py
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caching
+
+# Seconds the prescription medicine choices stay cached
+CATALOGUE_CACHE_TIMEOUT = getattr(settings, 'HOSPITAL_CATALOGUE_CACHE_TIMEOUT', 3600)
+
+MEDICINE_CATALOGUE_KEY = 'hospital:catalogue:medicines'
+
+
+def _compute_medicine_catalogue():
+    """Every medicine stocked by any pharmacy, de-duplicated case-insensitively."""
+    PharmacyStock = apps.get_model('hospital', 'PharmacyStock')
+    medicines = {}
+    for name in PharmacyStock.objects.order_by('medicine').values_list('medicine', flat=True).distinct():
+        medicines.setdefault(name.lower(), name)
+    return sorted(medicines.items(), key=lambda choice: choice[1].lower())
+
+
+def medicine_choices():
+    """Return (value, label) choices for prescriptions, built once and kept in cache."""
+    choices = caching.get(MEDICINE_CATALOGUE_KEY, 'catalogue')
+    if choices is None:
+        choices = _compute_medicine_catalogue()
+        cache.set(MEDICINE_CATALOGUE_KEY, choices, caching.shared_timeout(CATALOGUE_CACHE_TIMEOUT))
+    return choices
+
+
+def invalidate_medicine_catalogue():
+    # Drop the entry once the change is committed so no reader re-caches the old stock
+    transaction.on_commit(lambda: cache.delete(MEDICINE_CATALOGUE_KEY))
@@ -0,0 +1,96 @@
+# hospital/dashboard.py
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import caching, models
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'HOSPITAL_DASHBOARD_CACHE_TIMEOUT', 60)
+DASHBOARD_RECENT_LIMIT = getattr(settings, 'HOSPITAL_DASHBOARD_RECENT_LIMIT', 10)
+DOCTOR_DASHBOARD_APPOINTMENT_LIMIT = getattr(settings, 'HOSPITAL_DOCTOR_DASHBOARD_APPOINTMENT_LIMIT', 20)
+
+ADMIN_COUNTS_KEY = 'hospital:dashboard:admin'
+
+
+def _doctor_counts_key(doctor_user_id):
+    return f"hospital:dashboard:doctor:{doctor_user_id}"
+
+
+def _compute_admin_counts():
+    """One conditional aggregate per table instead of one COUNT per card."""
+    counts = {}
+    counts.update(models.Doctor.objects.aggregate(
+        doctorcount=Count('id', filter=Q(status=True)),
+        pendingdoctorcount=Count('id', filter=Q(status=False)),
+    ))
+    counts.update(models.Patient.objects.aggregate(
+        patientcount=Count('id', filter=Q(status=True)),
+        pendingpatientcount=Count('id', filter=Q(status=False)),
+    ))
+    counts.update(models.Appointment.objects.aggregate(
+        appointmentcount=Count('id', filter=Q(status='Approved')),
+        pendingappointmentcount=Count('id', filter=Q(status='Pending')),
+    ))
+    counts.update(models.Department.objects.aggregate(
+        departmentcount=Count('id'),
+        activedepartmentcount=Count('id', filter=Q(head_of_department__isnull=False)),
+    ))
+    counts.update(models.WardRoom.objects.aggregate(
+        wardcount=Count('id'),
+        occupiedwardcount=Count('id', filter=Q(availability=False)),
+    ))
+    return counts
+
+
+def get_admin_counts():
+    """Return the admin dashboard counters, served from cache for a short TTL."""
+    counts = caching.get(ADMIN_COUNTS_KEY, 'dashboard')
+    if counts is None:
+        counts = _compute_admin_counts()
+        cache.set(ADMIN_COUNTS_KEY, counts, DASHBOARD_CACHE_TIMEOUT)
+    return counts
+
+
+def invalidate_admin_counts():
+    cache.delete(ADMIN_COUNTS_KEY)
+
+
+def recent_doctors(limit=DASHBOARD_RECENT_LIMIT):
+    return models.Doctor.objects.select_related('user').order_by('-id')[:limit]
+
+
+def recent_patients(limit=DASHBOARD_RECENT_LIMIT):
+    return models.Patient.objects.select_related('user').order_by('-id')[:limit]
+
+
+def _compute_doctor_counts(doctor):
+    user = doctor.user
+    return {
+        'patientcount': models.Patient.objects.filter(status=True, assignedDoctorId=user.id).count(),
+        'appointmentcount': models.Appointment.objects.filter(status='Approved', doctor=doctor).count(),
+        'patientdischarged': models.PatientDischargeDetails.objects.filter(assignedDoctorName=user.first_name).distinct().count(),
+        'medicalrecordcount': models.MedicalRecord.objects.filter(doctor=doctor).count(),
+    }
+
+
+def get_doctor_counts(doctor):
+    """Return the doctor dashboard counters, served from cache for a short TTL."""
+    key = _doctor_counts_key(doctor.user_id)
+    counts = caching.get(key, 'dashboard')
+    if counts is None:
+        counts = _compute_doctor_counts(doctor)
+        cache.set(key, counts, DASHBOARD_CACHE_TIMEOUT)
+    return counts
+
+
+def invalidate_doctor_counts(*doctor_user_ids):
+    cache.delete_many([_doctor_counts_key(user_id) for user_id in doctor_user_ids if user_id])
+
+
+def doctor_appointments(doctor, limit=DOCTOR_DASHBOARD_APPOINTMENT_LIMIT):
+    """Most recent approved appointments of a doctor, each joined with its patient."""
+    return (
+        models.Appointment.objects.filter(status='Approved', doctor=doctor)
+        .select_related('patient__user')
+        .order_by('-appointmentDate', '-id')[:limit]
+    )
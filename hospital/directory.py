@@ -0,0 +1,165 @@
+# hospital/directory.py
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+
+from . import caching
+
+# Lowest trigram similarity (0-1) at which a misspelt word still matches
+FUZZY_THRESHOLD = getattr(settings, 'HOSPITAL_DIRECTORY_FUZZY_THRESHOLD', 0.4)
+# Seconds after which the index is rebuilt even though no change was seen, which bounds how
+# long another worker's change goes unseen under the per-process cache
+MAX_AGE = getattr(settings, 'HOSPITAL_DIRECTORY_MAX_AGE', 300)
+# Suggestions the type-ahead endpoint returns by default
+SUGGESTION_LIMIT = getattr(settings, 'HOSPITAL_DIRECTORY_SUGGESTION_LIMIT', 10)
+# Shorter words only match exactly or as a prefix; two letters have too few trigrams to compare
+FUZZY_MIN_LENGTH = 3
+MAX_TERMS = 8
+
+EXACT, PREFIX = 3.0, 2.0  # a fuzzy match scores its similarity, below both
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """Casefold and strip accents, so "José" and "jose" are the same word."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def words(text):
+    return _WORD.findall(normalize(text))
+
+
+def trigrams(word):
+    # Padded like pg_trgm, so the start of a word weighs more than its end
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b)
+
+
+class DoctorIndex:
+    """
+    A read-only snapshot of the approved doctors, searchable by the words of
+    their name and department.
+
+    Words are kept sorted for prefix lookups, and every word is listed under
+    its trigrams so a misspelt query word only has to be compared with words
+    that share a trigram with it. Queries never touch the database.
+    """
+
+    def __init__(self, doctors, generation=None):
+        self.doctors = list(doctors)
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self._postings = defaultdict(set)
+        for position, doctor in enumerate(self.doctors):
+            for word in words(f"{doctor.user.first_name} {doctor.user.last_name} {doctor.department}"):
+                self._postings[word].add(position)
+        self._words = sorted(self._postings)
+        self._trigrams = defaultdict(set)
+        for word in self._words:
+            for trigram in trigrams(word):
+                self._trigrams[trigram].add(word)
+
+    def __len__(self):
+        return len(self.doctors)
+
+    def _match(self, scores, word, score):
+        for position in self._postings[word]:
+            if score > scores.get(position, 0):
+                scores[position] = score
+
+    def _term_scores(self, term):
+        """{position: score} of the doctors with a word matching ``term``."""
+        scores = {}
+        for word in self._words[bisect.bisect_left(self._words, term):]:
+            if not word.startswith(term):
+                break
+            self._match(scores, word, EXACT if word == term else PREFIX)
+        if scores or len(term) < FUZZY_MIN_LENGTH:
+            return scores
+        candidates = set().union(*(self._trigrams.get(trigram, ()) for trigram in trigrams(term)))
+        for word in candidates:
+            # Against the word's own start as well, for a misspelling typed halfway ("cardo")
+            score = max(similarity(term, word), similarity(term, word[:len(term)]))
+            if score >= FUZZY_THRESHOLD:
+                self._match(scores, word, score)
+        return scores
+
+    def search(self, query, limit=None):
+        """
+        Doctors matching every word of ``query``, best first; all of them when it has no words.
+
+        A query word matches a doctor's word exactly, as its prefix, or, when
+        neither finds anything, by trigram similarity.
+        """
+        terms = words(query)[:MAX_TERMS]
+        if not terms:
+            ranked = sorted(range(len(self.doctors)), key=self._sort_name)
+        else:
+            scores = None
+            for term in terms:
+                term_scores = self._term_scores(term)
+                scores = term_scores if scores is None else {
+                    position: score + term_scores[position]
+                    for position, score in scores.items() if position in term_scores
+                }
+                if not scores:
+                    return []
+            ranked = sorted(scores, key=lambda position: (-scores[position], self._sort_name(position)))
+        return [self.doctors[position] for position in ranked[:limit]]
+
+    def _sort_name(self, position):
+        user = self.doctors[position].user
+        return normalize(f"{user.first_name} {user.last_name}"), position
+
+
+def build(generation=None):
+    Doctor = apps.get_model('hospital', 'Doctor')
+    return DoctorIndex(Doctor.objects.filter(status=True).select_related('user').order_by('id'), generation)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def _is_current(index, generation):
+    return (index is not None and index.generation == generation
+            and time.monotonic() - index.built_at < MAX_AGE)
+
+
+def get_index():
+    """
+    This process's doctor index, rebuilt when the 'doctors' cache generation moved.
+
+    Saving, approving, rejecting or deleting a Doctor bumps that generation.
+    Only a shared cache carries the bump to the other workers, so the index
+    is also rebuilt once it is older than MAX_AGE.
+    """
+    global _index
+    generation = caching.generation('doctors')
+    index = _index
+    if _is_current(index, generation):
+        caching.stats.record('doctor-directory', True)
+        return index
+    with _lock:
+        if not _is_current(_index, generation):
+            # The generation is read before the doctors, so a change made meanwhile triggers another rebuild
+            _index = build(generation)
+        caching.stats.record('doctor-directory', False)
+        return _index
+
+
+def search(query, limit=None):
+    return get_index().search(query, limit)
@@ -1,8 +1,9 @@
 # hospital/forms.py
 from django import forms
-from . import models
+from . import catalogue, models
 from django.contrib.auth.forms import AuthenticationForm
 from django.utils import timezone
+from datetime import datetime, time, timedelta
 import django.forms as forms
 import json
 from . import models
@@ -120,6 +121,9 @@ class ContactusForm(forms.Form):
     Message = forms.CharField(max_length=500, widget=forms.Textarea(attrs={'rows': 3, 'cols': 30}))
 
 class PharmacyForm(forms.ModelForm):
+    # Stock is stored in PharmacyStock rows; this carries the {name: {quantity, price}} built in clean()
+    available_medicines = forms.JSONField(required=False, widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3}))
+
     # Fields for the first medicine
     medicine_name_1 = forms.CharField(max_length=100, required=False, label="Medicine Name 1")
     quantity_1 = forms.IntegerField(min_value=0, required=False, label="Quantity 1", initial=0)
@@ -132,11 +136,10 @@ class PharmacyForm(forms.ModelForm):
 
     class Meta:
         model = models.Pharmacy
-        fields = ['pharmacy_id', 'pharmacist', 'available_medicines']
+        fields = ['pharmacy_id', 'pharmacist']
         widgets = {
             'pharmacy_id': forms.TextInput(attrs={'class': 'form-control'}),
             'pharmacist': forms.Select(attrs={'class': 'form-control'}),
-            'available_medicines': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
 
     def __init__(self, *args, **kwargs):
@@ -144,8 +147,8 @@ class PharmacyForm(forms.ModelForm):
         doctor_group = Group.objects.get(name='DOCTOR')
         self.fields['pharmacist'].queryset = User.objects.filter(groups=doctor_group)
 
-        # If editing, prefill the medicine fields from available_medicines
-        if self.instance and self.instance.available_medicines:
+        # If editing, prefill the medicine fields from the pharmacy's stock
+        if self.instance and self.instance.pk and self.instance.available_medicines:
             medicines = list(self.instance.available_medicines.items())
             if len(medicines) > 0:
                 self.fields['medicine_name_1'].initial = medicines[0][0]
@@ -171,7 +174,7 @@ class PharmacyForm(forms.ModelForm):
                 raise forms.ValidationError("Quantity 1 is required if medicine name or price is provided.")
             if price_1 is None:
                 raise forms.ValidationError("Price 1 is required if medicine name or quantity is provided.")
-            medicines[med_name_1] = {'quantity': quantity_1, 'price': float(price_1)}
+            medicines[med_name_1.strip()] = {'quantity': quantity_1, 'price': float(price_1)}
 
         # Validate second medicine
         med_name_2 = cleaned_data.get('medicine_name_2')
@@ -184,9 +187,10 @@ class PharmacyForm(forms.ModelForm):
                 raise forms.ValidationError("Quantity 2 is required if medicine name or price is provided.")
             if price_2 is None:
                 raise forms.ValidationError("Price 2 is required if medicine name or quantity is provided.")
-            if med_name_2 in medicines:
+            # Stock is unique per pharmacy regardless of case, so "Aspirin" and "aspirin" collide
+            if med_name_2.strip().casefold() in {name.casefold() for name in medicines}:
                 raise forms.ValidationError("Medicine names must be unique.")
-            medicines[med_name_2] = {'quantity': quantity_2, 'price': float(price_2)}
+            medicines[med_name_2.strip()] = {'quantity': quantity_2, 'price': float(price_2)}
 
         cleaned_data['available_medicines'] = medicines or None
         return cleaned_data
@@ -197,14 +201,28 @@ class PharmacyForm(forms.ModelForm):
             return None
         if not isinstance(data, dict):
             raise forms.ValidationError("Available medicines must be a dictionary.")
+        medicines, seen = {}, set()
         for key, value in data.items():
+            name = str(key).strip()
+            if not name:
+                raise forms.ValidationError("Medicine names cannot be empty.")
+            if name.casefold() in seen:
+                raise forms.ValidationError("Medicine names must be unique.")
+            seen.add(name.casefold())
             if not isinstance(value, dict) or 'quantity' not in value or 'price' not in value:
                 raise forms.ValidationError("Each medicine must have a quantity and price.")
             if not isinstance(value['quantity'], int) or value['quantity'] < 0:
                 raise forms.ValidationError("Medicine quantities must be non-negative integers.")
             if not isinstance(value['price'], (int, float)) or value['price'] < 0:
                 raise forms.ValidationError("Medicine prices must be non-negative numbers.")
-        return data
+            medicines[name] = value
+        return medicines
+
+    def save(self, commit=True):
+        pharmacy = super().save(commit=commit)
+        if commit:
+            pharmacy.replace_stock(self.cleaned_data.get('available_medicines'))
+        return pharmacy
 
 class MedicalRecordForm(forms.ModelForm):
     class Meta:
@@ -223,6 +241,48 @@ class MedicalRecordForm(forms.ModelForm):
         except json.JSONDecodeError:
             raise forms.ValidationError("Invalid JSON format for test results.")
 
+def start_of_day(day):
+    """Aware datetime of local midnight at the start of ``day``."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class MedicalRecordFilterForm(forms.Form):
+    STATUS_CHOICES = (
+        ('', 'Any status'),
+        ('pending', 'Pending'),
+        ('dispensed', 'Dispensed'),
+    )
+
+    doctor = forms.ModelChoiceField(
+        queryset=models.Doctor.objects.select_related('user').order_by('user__first_name'),
+        required=False,
+        empty_label="Any doctor",
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    patient = forms.IntegerField(required=False, widget=forms.HiddenInput())
+    status = forms.ChoiceField(choices=STATUS_CHOICES, required=False, widget=forms.Select(attrs={'class': 'form-control'}))
+    date_from = forms.DateField(required=False, label="From", widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    date_to = forms.DateField(required=False, label="To", widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+
+    def filter(self, queryset):
+        """Apply the valid filters to a MedicalRecord queryset."""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data['doctor']:
+            queryset = queryset.filter(doctor=data['doctor'])
+        if data['patient']:
+            queryset = queryset.filter(patient_id=data['patient'])
+        if data['status']:
+            queryset = queryset.filter(status=data['status'])
+        # Bounds on the bare column, which the (created_at, id) index can serve; a __date
+        # lookup would wrap every row in a cast
+        if data['date_from']:
+            queryset = queryset.filter(created_at__gte=start_of_day(data['date_from']))
+        if data['date_to']:
+            queryset = queryset.filter(created_at__lt=start_of_day(data['date_to'] + timedelta(days=1)))
+        return queryset
+
 # New form for doctors
 class DoctorMedicalRecordForm(forms.ModelForm):
     prescribed_treatment = forms.MultipleChoiceField(
@@ -246,11 +306,7 @@ class DoctorMedicalRecordForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        available_medicines = {}
-        for pharmacy in models.Pharmacy.objects.all():
-            if pharmacy.available_medicines:
-                available_medicines.update({med.lower(): med for med in pharmacy.available_medicines.keys()})
-        self.fields['prescribed_treatment'].choices = list(available_medicines.items())
+        self.fields['prescribed_treatment'].choices = catalogue.medicine_choices()
         if self.instance.pk and self.instance.prescribed_treatment:
             try:
                 initial_medicines = json.loads(self.instance.prescribed_treatment)
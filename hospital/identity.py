@@ -0,0 +1,57 @@
+# hospital/identity.py
+import contextvars
+
+from django.apps import apps
+
+_identity_map = contextvars.ContextVar('hospital_identity_map', default=None)
+
+
+class IdentityMap:
+    """Patient and Doctor rows loaded during one request, keyed by their user id."""
+
+    def __init__(self):
+        self._rows = {}
+
+    def get(self, model_name, user_id):
+        key = (model_name, user_id)
+        if key not in self._rows:
+            self._rows[key] = _load(model_name, user_id)
+        return self._rows[key]
+
+
+def _load(model_name, user_id):
+    # Fetched through the app registry: models.py itself resolves doctors through here
+    model = apps.get_model('hospital', model_name)
+    return model.objects.select_related('user').filter(user_id=user_id).first()
+
+
+def activate():
+    """Start a fresh identity map for the current request; returns a token for deactivate()."""
+    return _identity_map.set(IdentityMap())
+
+
+def deactivate(token):
+    _identity_map.reset(token)
+
+
+def _lookup(model_name, user_id):
+    identity_map = _identity_map.get()
+    if identity_map is None:
+        return _load(model_name, user_id)
+    return identity_map.get(model_name, user_id)
+
+
+def doctor_for_user(user_id):
+    """The Doctor of a user, with its user, loaded at most once per request. Raises Doctor.DoesNotExist."""
+    doctor = _lookup('Doctor', user_id)
+    if doctor is None:
+        raise apps.get_model('hospital', 'Doctor').DoesNotExist(f"No doctor for user {user_id}")
+    return doctor
+
+
+def patient_for_user(user_id):
+    """The Patient of a user, with its user, loaded at most once per request. Raises Patient.DoesNotExist."""
+    patient = _lookup('Patient', user_id)
+    if patient is None:
+        raise apps.get_model('hospital', 'Patient').DoesNotExist(f"No patient for user {user_id}")
+    return patient
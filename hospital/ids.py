@@ -0,0 +1,115 @@
+# hospital/ids.py
+import os
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+ID_BLOCK_SIZE = getattr(settings, 'HOSPITAL_ID_BLOCK_SIZE', 100)
+
+
+def encode(value, width):
+    """Fixed-width, upper-case base36 encoding of a non-negative integer."""
+    digits = []
+    while value:
+        value, rem = divmod(value, 36)
+        digits.append(ALPHABET[rem])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+
+class IdAllocator:
+    """
+    Hands out monotonic IDs such as REC0000002S from a database sequence.
+
+    Each process reserves a block of values with one UPDATE and then serves
+    the block from memory, so workers never hand out the same value and the
+    database is only touched once per block.
+    """
+
+    def __init__(self, name, prefix, width, block_size=ID_BLOCK_SIZE):
+        self.name = name
+        self.prefix = prefix
+        self.width = width
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = self._end = 0
+
+    def next_value(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.in_atomic_block and connection.vendor == 'sqlite':
+            # SQLite reserves inside the caller's transaction (see _reserve_block). A block
+            # cached from there would outlive a rollback that undid its UPDATE, and the
+            # next reservation would hand the same values out again, so take one value
+            # and cache nothing.
+            start, _ = self._reserve_block(1)
+            return start
+        with self._lock:
+            # A forked worker must not reuse the block its parent was serving
+            if self._pid != os.getpid() or self._next >= self._end:
+                self._next, self._end = self._reserve_block()
+                self._pid = os.getpid()
+            value = self._next
+            self._next += 1
+            return value
+
+    def next_id(self):
+        return self.prefix + encode(self.next_value(), self.width)
+
+    def reserve_ids(self, count):
+        """Reserve ``count`` consecutive IDs with a single UPDATE, for bulk inserts."""
+        start, end = self._reserve_block(count)
+        return [self.prefix + encode(value, self.width) for value in range(start, end)]
+
+    def _reserve_block(self, size=None):
+        size = size or self.block_size
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.in_atomic_block and connection.vendor != 'sqlite':
+            # Reserve on a separate connection, like a real sequence, so a rollback of the
+            # caller's transaction cannot hand the same block out twice. SQLite allows a
+            # single writer, so a second connection would wait on the caller's own write
+            # lock; there the reservation joins the caller's transaction and rolls back
+            # with it, and next_value() does not cache it.
+            connection = connections.create_connection(DEFAULT_DB_ALIAS)
+            try:
+                connection.set_autocommit(False)
+                block = self._reserve_on(connection, size)
+                connection.commit()
+                return block
+            finally:
+                connection.close()
+        with transaction.atomic():
+            return self._reserve_on(connection, size)
+
+    def _reserve_on(self, connection, size):
+        table = connection.ops.quote_name(apps.get_model('hospital', 'IdSequence')._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s",
+                [size, self.name],
+            )
+            if cursor.rowcount == 0:
+                # Sequences are created by migrations; this only covers new names
+                cursor.execute(
+                    f"INSERT INTO {table} (name, next_value) VALUES (%s, %s)",
+                    [self.name, 1 + size],
+                )
+            cursor.execute(f"SELECT next_value FROM {table} WHERE name = %s", [self.name])
+            end = cursor.fetchone()[0]
+        return end - size, end
+
+
+# record_id is max_length=15 and bill_id max_length=10
+record_ids = IdAllocator('medical_record', 'REC', 8)
+bill_ids = IdAllocator('billing', 'BILL', 6)
+
+
+def next_record_id():
+    return record_ids.next_id()
+
+
+def next_bill_id():
+    return bill_ids.next_id()
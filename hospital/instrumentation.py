@@ -0,0 +1,173 @@
+# hospital/instrumentation.py
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger('hospital.metrics')
+
+METRICS_WINDOW = getattr(settings, 'HOSPITAL_METRICS_WINDOW', 500)
+# {view name or dotted view path: max queries}; views without an entry use the default
+QUERY_BUDGETS = getattr(settings, 'HOSPITAL_QUERY_BUDGETS', {})
+DEFAULT_QUERY_BUDGET = getattr(settings, 'HOSPITAL_DEFAULT_QUERY_BUDGET', None)
+# Raise instead of logging a warning, for test settings
+QUERY_BUDGET_STRICT = getattr(settings, 'HOSPITAL_QUERY_BUDGET_STRICT', False)
+
+PERCENTILES = (50, 95, 99)
+
+_current = contextvars.ContextVar('hospital_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Counters collected while one request is being served."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper(); counts without DEBUG
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+
+# Template render time: wrap Template.render once and count only outermost renders,
+# so includes are not added on top of the template that includes them
+_original_render = Template.render
+
+
+def _timed_render(self, context):
+    metrics = _current.get()
+    if metrics is None:
+        return _original_render(self, context)
+    metrics._template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        metrics._template_depth -= 1
+        if not metrics._template_depth:
+            metrics.template_time += time.perf_counter() - start
+
+
+def install_template_timer():
+    if Template.render is not _timed_render:
+        Template.render = _timed_render
+
+
+class MetricsStore:
+    """
+    Rolling window of the latest samples per view, kept in process memory.
+
+    Each worker process keeps its own window, so the admin page shows the
+    worker that served it.
+    """
+
+    FIELDS = ('queries', 'sql_ms', 'template_ms', 'total_ms', 'bytes')
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def add(self, view, sample):
+        with self._lock:
+            self._samples[view].append(sample)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        """[{view, count, <field>: {p50, p95, p99}}] sorted by p95 total time, slowest first."""
+        with self._lock:
+            snapshot = {view: list(samples) for view, samples in self._samples.items()}
+        rows = []
+        for view, samples in snapshot.items():
+            row = {'view': view, 'count': len(samples)}
+            for field in self.FIELDS:
+                values = sorted(sample[field] for sample in samples if sample[field] is not None)
+                row[field] = {f'p{p}': percentile(values, p) for p in PERCENTILES}
+            rows.append(row)
+        rows.sort(key=lambda row: row['total_ms']['p95'] or 0, reverse=True)
+        return rows
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list (None when empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-p * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+
+store = MetricsStore()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name or match._func_path
+
+
+def query_budget(request, name):
+    match = request.resolver_match
+    for key in (name, match._func_path):
+        if key in QUERY_BUDGETS:
+            return QUERY_BUDGETS[key]
+    return DEFAULT_QUERY_BUDGET
+
+
+def measure(request, get_response):
+    """Serve the request while collecting its metrics; returns (response, RequestMetrics, seconds)."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = get_response(request)
+    finally:
+        _current.reset(token)
+    return response, metrics, time.perf_counter() - start
+
+
+def record(request, response, metrics, elapsed):
+    name = view_name(request)
+    if name is None:
+        return
+    sample = {
+        'queries': metrics.queries,
+        'sql_ms': round(metrics.sql_time * 1000, 2),
+        'template_ms': round(metrics.template_time * 1000, 2),
+        'total_ms': round(elapsed * 1000, 2),
+        'bytes': None if response.streaming else len(response.content),
+    }
+    store.add(name, sample)
+    logger.info(json.dumps(dict(sample, view=name, method=request.method, path=request.path, status=response.status_code)))
+
+    budget = query_budget(request, name)
+    if budget is not None and metrics.queries > budget:
+        message = f"{name} ran {metrics.queries} queries, over its budget of {budget}"
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,374 @@
+# hospital/invoices.py
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait as wait_futures
+
+import django
+from django.apps import apps
+
+from django.conf import settings
+from django.db import connection
+from django.template.loader import get_template
+from django.utils import timezone
+from reportlab.pdfgen import canvas
+from xhtml2pdf import pisa
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Invoices hold patient data, so they are kept outside MEDIA_ROOT, which is served to anyone
+INVOICE_ROOT = getattr(settings, 'HOSPITAL_INVOICE_ROOT', os.path.join(settings.BASE_DIR, 'invoices'))
+INVOICE_WORKERS = getattr(settings, 'HOSPITAL_INVOICE_WORKERS', 2)
+EXPORT_WORKERS = getattr(settings, 'HOSPITAL_INVOICE_EXPORT_WORKERS', os.cpu_count())
+# The admin action renders inside a web worker that already runs the invoice threads, so it
+# keeps to a small pool; month-end runs belong to the export_invoices command
+ADMIN_EXPORT_WORKERS = getattr(settings, 'HOSPITAL_INVOICE_ADMIN_EXPORT_WORKERS', 2)
+EXPORT_BATCH_SIZE = 500
+# Seconds a superseded render of a bill is kept, so a download or export that already
+# holds its path can still open it; prune() removes it afterwards
+PRUNE_AFTER = getattr(settings, 'HOSPITAL_INVOICE_PRUNE_AFTER', 24 * 3600)
+
+BILL_TEMPLATE = 'hospital/download_bill.html'
+
+# Bump when the template or the canvas layout changes so old artefacts are not served
+RENDER_VERSION = 1
+
+Artefact = namedtuple('Artefact', ['path', 'digest', 'modified'])
+
+_executor = ThreadPoolExecutor(max_workers=INVOICE_WORKERS, thread_name_prefix='invoice')
+_pending = {}
+_pending_lock = threading.Lock()
+_queued = set()
+_queued_lock = threading.Lock()
+
+
+# Invoice data
+def latest_invoice_rows(patient_id):
+    """Most recent (discharge, bill) of a patient, as shown by the invoice download."""
+    discharge = models.PatientDischargeDetails.objects.filter(patientId=patient_id).order_by('-id').first()
+    bill = models.Billing.objects.filter(patient_id=patient_id).order_by('-created_at').first()
+    return discharge, bill
+
+
+def bill_context(bill, discharge):
+    return {
+        'bill_id': bill.bill_id,
+        'patientName': discharge.patientName,
+        'assignedDoctorName': discharge.assignedDoctorName,
+        'address': discharge.address,
+        'mobile': discharge.mobile,
+        'symptoms': discharge.symptoms,
+        'admitDate': discharge.admitDate,
+        'releaseDate': discharge.releaseDate,
+        'daySpent': discharge.daySpent,
+        'medicineCost': discharge.medicineCost,
+        'roomCharge': discharge.roomCharge,
+        'doctorFee': discharge.doctorFee,
+        'otherCharge': discharge.OtherCharge,
+        'total': discharge.total,
+        'treatmentCost': bill.treatment_cost,
+        'paymentStatus': bill.payment_status,
+    }
+
+
+def summary_context(bill, discharge, patient_name):
+    return {
+        'bill_id': bill.bill_id,
+        'patientName': patient_name,
+        'admitDate': discharge.admitDate,
+        'releaseDate': discharge.releaseDate,
+        'daySpent': discharge.daySpent,
+        'roomCharge': discharge.roomCharge,
+        'doctorFee': discharge.doctorFee,
+        'medicineCost': discharge.medicineCost,
+        'otherCharge': discharge.OtherCharge,
+        'total': discharge.total,
+        'paymentStatus': bill.payment_status,
+    }
+
+
+# Renderers: context -> PDF bytes (or None on failure)
+def render_bill(context):
+    """The xhtml2pdf invoice behind download-pdf/<pk>."""
+    html = get_template(BILL_TEMPLATE).render(dict(context, generated_on=timezone.now()))
+    result = io.BytesIO()
+    pdf = pisa.pisaDocument(io.BytesIO(html.encode("ISO-8859-1")), result)
+    if pdf.err:
+        return None
+    return result.getvalue()
+
+
+def render_summary(context):
+    """The reportlab bill behind generate-bill-pdf/<patient_id>."""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer)
+    p.setFont("Helvetica", 16)
+    p.drawString(100, 750, "Hospital Bill")
+    p.setFont("Helvetica", 12)
+    p.drawString(100, 730, f"Bill ID: {context['bill_id']}")
+    p.drawString(100, 710, f"Patient Name: {context['patientName']}")
+    p.drawString(100, 690, f"Admit Date: {context['admitDate']}")
+    p.drawString(100, 670, f"Release Date: {context['releaseDate']}")
+    p.drawString(100, 650, f"Days Spent: {context['daySpent']}")
+    p.drawString(100, 630, f"Room Charge: ${context['roomCharge']}")
+    p.drawString(100, 610, f"Doctor Fee: ${context['doctorFee']}")
+    p.drawString(100, 590, f"Medicine Cost: ${context['medicineCost']}")
+    p.drawString(100, 570, f"Other Charges: ${context['otherCharge']}")
+    p.drawString(100, 550, f"Total Amount: ${context['total']}")
+    p.drawString(100, 530, f"Payment Status: {context['paymentStatus']}")
+    p.drawString(100, 510, f"Generated On: {timezone.now()}")
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'bill': render_bill,
+    'summary': render_summary,
+}
+
+
+# Artefact store
+def content_digest(kind, context):
+    """Hash of everything that ends up in the PDF; a changed bill or discharge gets a new digest."""
+    payload = json.dumps([RENDER_VERSION, kind, context], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _path(kind, context, digest):
+    # One directory per bill, so prune() can tell the current render from the ones it replaced
+    return os.path.join(INVOICE_ROOT, kind, str(context['bill_id']), f"{digest}.pdf")
+
+
+def _artefact(kind, context, digest):
+    path = _path(kind, context, digest)
+    try:
+        return Artefact(path, digest, os.path.getmtime(path))
+    except OSError:
+        return None
+
+
+def _render_and_store(kind, context, digest):
+    artefact = _artefact(kind, context, digest)
+    if artefact:
+        return artefact
+    pdf = RENDERERS[kind](context)
+    if pdf is None:
+        return None
+    path = _path(kind, context, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write aside and rename so other workers never serve a half-written file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp_path, path)
+    return _artefact(kind, context, digest)
+
+
+def _submit(kind, context):
+    digest = content_digest(kind, context)
+    artefact = _artefact(kind, context, digest)
+    if artefact:
+        return artefact, None
+    with _pending_lock:
+        # Concurrent requests for the same invoice wait on one render
+        future = _pending.get(digest)
+        if future is None:
+            future = _track(_executor.submit(_render_and_store, kind, context, digest))
+            _pending[digest] = future
+            future.add_done_callback(lambda f: _pending.pop(digest, None))
+    return None, future
+
+
+def get_or_render(kind, context):
+    """Return the stored Artefact for this invoice, rendering it in the worker pool if needed."""
+    artefact, future = _submit(kind, context)
+    return artefact or future.result()
+
+
+def prune(older_than=PRUNE_AFTER):
+    """
+    Delete the renders a newer render of the same bill replaced, and leftover
+    temporary files, once they are ``older_than`` seconds old; returns the count.
+
+    The newest render of each bill is always kept. Run it from a periodic job
+    (the prune_invoices command) rather than after each render, which would
+    pull files from under readers that already hold their path.
+    """
+    cutoff = time.time() - older_than
+    removed = 0
+    for kind in RENDERERS:
+        kind_dir = os.path.join(INVOICE_ROOT, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for bill_dir in os.scandir(kind_dir):
+            if not bill_dir.is_dir():
+                continue
+            entries = sorted(os.scandir(bill_dir.path), key=lambda entry: entry.stat().st_mtime, reverse=True)
+            renders = [entry for entry in entries if entry.name.endswith('.pdf')]
+            stale = [entry for entry in entries if entry.name.endswith('.tmp')] + renders[1:]
+            for entry in stale:
+                if entry.stat().st_mtime < cutoff:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+    return removed
+
+
+def _prerender_patient(patient_id):
+    try:
+        discharge, bill = latest_invoice_rows(patient_id)
+        if discharge and bill:
+            _submit('bill', bill_context(bill, discharge))
+    finally:
+        # Worker threads hold their own connection; don't leave it open between jobs
+        connection.close()
+
+
+def prerender_patient_invoice(patient_id):
+    """Queue the patient's current invoice so the download is served from disk."""
+    if patient_id:
+        _track(_executor.submit(_prerender_patient, patient_id))
+
+
+def _track(future):
+    with _queued_lock:
+        _queued.add(future)
+    future.add_done_callback(_queued.discard)
+    return future
+
+
+def wait():
+    """Block until every queued render has finished, e.g. before a tool drops its database."""
+    while True:
+        with _queued_lock:
+            futures = list(_queued)
+        if not futures:
+            return
+        wait_futures(futures)
+
+
+# Batch export
+def _bill_for_stay(bills, discharge):
+    """The newest of a patient's bills (newest first) created during the discharge's stay."""
+    for bill in bills:
+        if discharge.admitDate <= timezone.localdate(bill.created_at) <= discharge.releaseDate:
+            return bill
+    return None
+
+
+def export_jobs(discharges, kind='bill', stats=None):
+    """
+    Yield (archive name, context) for each discharge, paired with the bill of that stay.
+
+    A patient admitted several times has a discharge and a bill per stay, so the
+    bill is the newest one created between the admit and release dates.
+    Discharges without one are skipped, logged and counted in ``stats['unbilled']``
+    when ``stats`` is given. Discharges are read in primary-key
+    batches with one bill query per batch, so a month of invoices never sits
+    in memory at once.
+    """
+    discharges = discharges.order_by('id')
+    last_id = 0
+    while True:
+        batch = list(discharges.filter(id__gt=last_id)[:EXPORT_BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        bills = {}
+        for bill in models.Billing.objects.filter(patient_id__in={d.patientId for d in batch}).order_by('patient_id', '-created_at'):
+            bills.setdefault(bill.patient_id, []).append(bill)
+        for discharge in batch:
+            bill = _bill_for_stay(bills.get(discharge.patientId, []), discharge)
+            if bill is None:
+                logger.warning("Discharge %s of patient %s has no bill created during the stay; not exported",
+                               discharge.id, discharge.patientId)
+                if stats is not None:
+                    stats['unbilled'] = stats.get('unbilled', 0) + 1
+                continue
+            if kind == 'summary':
+                context = summary_context(bill, discharge, discharge.patientName)
+            else:
+                context = bill_context(bill, discharge)
+            yield f"bill_patient_{discharge.patientId}_{bill.bill_id}_{discharge.id}.pdf", context
+
+
+def _init_export_worker():
+    # Spawned (non-forked) workers start without Django configured
+    if not apps.ready:
+        django.setup()
+
+
+def _render_for_export(kind, context):
+    artefact = _render_and_store(kind, context, content_digest(kind, context))
+    return artefact.path if artefact else None
+
+
+class _ZipStream:
+    """Write-only file object that hands ZIP output back chunk by chunk."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        chunks, self.chunks = self.chunks, []
+        return b''.join(chunks)
+
+
+def stream_invoice_zip(jobs, kind='bill', workers=EXPORT_WORKERS, stats=None):
+    """
+    Render (archive name, context) jobs across a process pool and yield a ZIP of the PDFs.
+
+    Only a few renders per worker are in flight and each PDF is written to the
+    archive as soon as it is ready. Renders go through the artefact store, so
+    invoices already on disk are copied rather than rendered again. Counts
+    are recorded in ``stats`` when given; pass the same dict to export_jobs()
+    and the discharges it skipped are counted in an UNBILLED.txt in the archive.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(written=0, failed=0)
+    stream = _ZipStream()
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_export_worker) as pool:
+        # PDFs are already compressed; storing them keeps the export CPU-bound on rendering only
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+            def drain(limit):
+                while len(pending) > limit:
+                    name, future = pending.popleft()
+                    path = future.result()
+                    if path is None:
+                        stats['failed'] += 1
+                        continue
+                    archive.write(path, name)
+                    stats['written'] += 1
+
+            for name, context in jobs:
+                pending.append((name, pool.submit(_render_for_export, kind, context)))
+                drain(workers * 4)
+                data = stream.pop()
+                if data:
+                    yield data
+            drain(0)
+            if stats.get('unbilled'):
+                archive.writestr('UNBILLED.txt', (
+                    f"{stats['unbilled']} discharges have no bill created during the stay and are not in "
+                    f"this archive. Their ids are in the server log.\n"
+                ))
+        yield stream.pop()
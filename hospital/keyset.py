@@ -0,0 +1,80 @@
+# hospital/keyset.py
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(value, pk):
+    raw = f"{value.isoformat()}|{pk}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return (datetime, pk) from a cursor, or None when it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        value, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+
+class KeysetPage:
+    """
+    One page of a newest-first listing, positioned by (timestamp, id) instead of OFFSET.
+
+    Each page costs a single indexed range query however deep the reader
+    goes, and rows inserted meanwhile do not shift the following pages.
+    """
+
+    def __init__(self, queryset, params, per_page, field='created_at'):
+        after = decode_cursor(params.get('after'))
+        before = None if after else decode_cursor(params.get('before'))
+        if after:
+            value, pk = after
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        elif before:
+            value, pk = before
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+
+        if before:
+            # Walk backwards from the cursor, then restore newest-first order
+            items = list(queryset.order_by(field, 'pk')[:per_page + 1])
+            self.has_previous = len(items) > per_page
+            self.has_next = True
+            items = items[:per_page]
+            items.reverse()
+        else:
+            items = list(queryset.order_by(f'-{field}', '-pk')[:per_page + 1])
+            self.has_next = len(items) > per_page
+            self.has_previous = after is not None
+            items = items[:per_page]
+
+        self.object_list = items
+        self.field = field
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            last = self.object_list[-1]
+            return encode_cursor(getattr(last, self.field), last.pk)
+        return ''
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            first = self.object_list[0]
+            return encode_cursor(getattr(first, self.field), first.pk)
+        return ''
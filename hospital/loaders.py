@@ -0,0 +1,24 @@
+# hospital/loaders.py
+from django.db.models import F
+
+from . import models
+
+
+def patients_by_user_id(user_ids):
+    """Fetch the Patient rows for the given user ids in a single query."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    return {patient.user_id: patient for patient in models.Patient.objects.filter(user_id__in=user_ids)}
+
+
+def pair_appointments_with_patients(appointments):
+    """Return (appointment, patient) pairs, resolving every patient in one batch."""
+    appointments = list(appointments)
+    patients = patients_by_user_id(appt.patientId for appt in appointments)
+    return [(appt, patients.get(appt.patientId)) for appt in appointments]
+
+
+def with_ward_room(patients):
+    """Annotate each patient with the room_id of its ward room (None if unassigned) in the same query."""
+    return patients.annotate(ward_room_id=F('assigned_room__room_id'))
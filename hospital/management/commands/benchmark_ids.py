@@ -0,0 +1,41 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from hospital.ids import IdAllocator
+
+
+class Command(BaseCommand):
+    help = "Measure how many record/bill IDs the ID allocator hands out per second."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help="Total IDs to allocate.")
+        parser.add_argument('--threads', type=int, default=4, help="Concurrent allocating threads.")
+        parser.add_argument('--block-size', type=int, default=100, help="Values reserved per database round trip.")
+        parser.add_argument('--sequence', default='benchmark', help="Sequence name to allocate from.")
+
+    def handle(self, *args, **options):
+        count, threads = options['count'], options['threads']
+        allocator = IdAllocator(options['sequence'], 'BNC', 8, block_size=options['block_size'])
+        per_thread = count // threads
+
+        def allocate(_):
+            try:
+                return [allocator.next_id() for _ in range(per_thread)]
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            allocated = [value for chunk in pool.map(allocate, range(threads)) for value in chunk]
+        elapsed = time.perf_counter() - start
+
+        duplicates = len(allocated) - len(set(allocated))
+        self.stdout.write(
+            f"Allocated {len(allocated)} IDs on {threads} threads in {elapsed:.3f}s "
+            f"({len(allocated) / elapsed:,.0f} IDs/s), duplicates: {duplicates}"
+        )
+        if duplicates:
+            self.stderr.write(self.style.ERROR("Duplicate IDs were allocated."))
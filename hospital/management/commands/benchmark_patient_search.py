@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+
+from hospital import instrumentation, models, search
+
+
+class Command(BaseCommand):
+    help = ("Time the doctor patient search against the existing data: the old LIKE filter on symptoms and "
+            "first name, and the indexed search, for prefixes of the names in the database. Read-only; seed "
+            "a database first with seed_hospital.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500, help="Searches per method.")
+        parser.add_argument('--all-patients', action='store_true',
+                            help="Search every patient instead of the busiest doctor's, as the front desk would.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed for picking the queries.")
+
+    def handle(self, *args, **options):
+        busiest = (
+            models.Patient.objects.filter(status=True, assignedDoctorId__isnull=False)
+            .values('assignedDoctorId').annotate(patients=Count('id')).order_by('-patients').first()
+        )
+        if busiest is None:
+            raise CommandError("No admitted patients with a doctor; run seed_hospital first.")
+        doctor_user_id = None if options['all_patients'] else busiest['assignedDoctorId']
+        names = list(models.PatientSearchDocument.objects.values_list('name', flat=True)[:5000])
+        rng = random.Random(options['seed'])
+        # Type-ahead sized prefixes of real first and last names
+        queries = [word[:rng.randint(2, len(word))] for word in
+                   (rng.choice(rng.choice(names).split()) for _ in range(options['queries']))]
+
+        def like(query):
+            patients = models.Patient.objects.filter(status=True)
+            if doctor_user_id is not None:
+                patients = patients.filter(assignedDoctorId=doctor_user_id)
+            return list(patients.filter(Q(symptoms__icontains=query) | Q(user__first_name__icontains=query))
+                        .values_list('id', flat=True)[:search.RESULT_LIMIT])
+
+        def indexed(query):
+            return search.search_patients(query, doctor_user_id=doctor_user_id)
+
+        scope = 'all patients' if doctor_user_id is None else f"{busiest['patients']} patients of one doctor"
+        self.stdout.write(f"{models.PatientSearchDocument.objects.count()} documents, searching {scope}")
+        self.stdout.write(f"{'method':<8} {'searches/s':>11} {'p50 ms':>8} {'p95 ms':>8} {'avg hits':>9}")
+        for method, run in (('like', like), ('indexed', indexed)):
+            timings, hits = [], 0
+            for query in queries:
+                start = time.perf_counter()
+                hits += len(run(query))
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"{method:<8} {len(queries) / (sum(timings) / 1000):>11.1f} "
+                f"{instrumentation.percentile(timings, 50):>8.2f} {instrumentation.percentile(timings, 95):>8.2f} "
+                f"{hits / len(queries):>9.1f}"
+            )
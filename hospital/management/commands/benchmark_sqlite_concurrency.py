@@ -0,0 +1,152 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from hospital import instrumentation, models, seeding
+
+PREFIX = 'sqlbench'
+
+
+class Command(BaseCommand):
+    help = ("Run parallel patient bookings and admin dispenses against a file-backed SQLite database, "
+            "once per SQLite profile, and compare throughput and failed writes such as 'database is locked'.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Bookings and dispenses per mode, each.")
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent client threads.")
+        parser.add_argument('--modes', default='default,tuned',
+                            help="Comma-separated profiles to compare: default, tuned.")
+        parser.add_argument('--timeout', type=int, default=5,
+                            help="Seconds the default profile waits for the write lock (Django's default is 5).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark only applies to SQLite.")
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - {'default', 'tuned'}
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+        logging.getLogger('hospital.metrics').setLevel(logging.ERROR)
+        setup_test_environment()
+        self.stdout.write(f"{'mode':<8} {'view':<18} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+                          f"{'failed':>7} {'rows':>6}")
+        try:
+            for mode in modes:
+                for view, result in self.run_mode(mode, options).items():
+                    self.stdout.write(
+                        f"{mode:<8} {view:<18} {result['rps']:>8.1f} {result['p50']:>9.2f} {result['p95']:>9.2f} "
+                        f"{result['failed']:>7} {result['rows']:>6}"
+                    )
+        finally:
+            teardown_test_environment()
+
+    def run_mode(self, mode, options):
+        settings_dict = connection.settings_dict
+        old_options = settings_dict['OPTIONS']
+        old_test_name = settings_dict['TEST'].get('NAME')
+        # Concurrency needs a real file, SQLite test databases are in memory otherwise. journal_mode
+        # is stored in the file, so every mode gets a database of its own.
+        settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(prefix='hospital-sqlite-'), f'{mode}.sqlite3')
+        if mode == 'tuned':
+            pragmas = settings.HOSPITAL_SQLITE_TUNED_PRAGMAS
+            settings_dict['OPTIONS'] = dict(old_options, transaction_mode='IMMEDIATE')
+        else:
+            pragmas = {}
+            settings_dict['OPTIONS'] = {'timeout': options['timeout']}
+
+        with override_settings(HOSPITAL_SQLITE_PRAGMAS=pragmas):
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                return self.run_views(options['requests'], options['workers'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                settings_dict['OPTIONS'] = old_options
+                settings_dict['TEST']['NAME'] = old_test_name
+
+    def run_views(self, requests, workers):
+        seeding.HospitalSeeder(
+            doctors=10, patients=max(workers, 20), appointments=0, records=requests + 10, wards=0,
+            discharged=0, prefix=PREFIX,
+        ).run()
+        # Every prescription the dispenses take is pending and fits the seeded stock
+        models.MedicalRecord.objects.update(status='pending')
+        admin = User.objects.get(username=f"{PREFIX}_admin_0")
+        patients = list(models.Patient.objects.select_related('user').order_by('id')[:workers])
+        pharmacy = models.Pharmacy.objects.order_by('id').first()
+        records = list(models.MedicalRecord.objects.order_by('id').values_list('id', flat=True)[:requests])
+        when = (timezone.localtime() + timedelta(days=7)).strftime('%Y-%m-%dT%H:%M')
+
+        # Sessions are opened before timing starts; a client is only used by one thread at a time
+        patient_clients = [self.client(patient.user) for patient in patients]
+        admin_clients = [self.client(admin) for _ in range(workers)]
+        bookings = [
+            (patient_clients[i % workers], '/patient-book-appointment', {
+                'doctorId': patients[i % workers].assignedDoctorId,
+                'description': 'Concurrency benchmark',
+                'appointmentDate': when,
+            }) for i in range(requests)
+        ]
+        dispenses = [
+            (admin_clients[i % workers], '/admin-dispense-medication', {
+                'pharmacy': pharmacy.pk, 'prescription': record_id,
+            }) for i, record_id in enumerate(records)
+        ]
+        connection.close()
+
+        return {
+            'book_appointment': self.run_parallel(bookings, workers, models.Appointment.objects.all()),
+            'dispense': self.run_parallel(dispenses, workers, models.MedicalRecord.objects.filter(status='dispensed')),
+        }
+
+    def client(self, user):
+        # Unhandled lock errors surface as 500 responses instead of exceptions in the worker thread
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        return client
+
+    def run_parallel(self, jobs, workers, effect):
+        before = effect.count()
+        # Jobs for one client all land on the same thread, so clients are never shared
+        lanes = [jobs[i::workers] for i in range(workers)]
+        latencies, failed = [], 0
+        lock = threading.Lock()
+
+        def lane(lane_jobs):
+            nonlocal failed
+            try:
+                for client, path, data in lane_jobs:
+                    start = time.perf_counter()
+                    response = client.post(path, data)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+                        # Both views redirect on success; the dispense view renders its errors as a 200
+                        failed += response.status_code != 302
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lane, lanes))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            'rps': len(jobs) / elapsed,
+            'p50': instrumentation.percentile(latencies, 50),
+            'p95': instrumentation.percentile(latencies, 95),
+            'failed': failed,
+            'rows': effect.count() - before,
+        }
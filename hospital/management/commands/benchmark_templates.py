@@ -0,0 +1,69 @@
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from hospital import instrumentation, warmup
+
+TEMPLATES = [
+    'hospital/admin_dashboard.html',
+    'hospital/doctor_dashboard.html',
+    'hospital/patient_dashboard.html',
+]
+
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def make_backend(name, cached):
+    """A template engine configured like settings.TEMPLATES, with or without the cached loader."""
+    params = copy.deepcopy(settings.TEMPLATES[0])
+    del params['BACKEND']
+    params['NAME'] = name
+    params['APP_DIRS'] = False
+    params['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', UNCACHED_LOADERS)] if cached else UNCACHED_LOADERS
+    return DjangoTemplates(params)
+
+
+class Command(BaseCommand):
+    help = ("Compare per-render time of the dashboard templates with and without the cached template loader, "
+            "and the first render after startup with and without warm-up. Templates are rendered with an "
+            "empty context, so the numbers isolate loading and parsing from the views' data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=200, help="Renders per template and configuration.")
+
+    def handle(self, *args, **options):
+        renders = options['renders']
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        # Import the template tag libraries up front so the first row does not pay for them
+        make_backend('bench-imports', cached=False).get_template(TEMPLATES[0]).render({}, request)
+
+        self.stdout.write(f"{'template':<34} {'config':<16} {'first ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for name in TEMPLATES:
+            for config, backend, warm in (
+                ('uncached', make_backend('bench-uncached', cached=False), False),
+                ('cached', make_backend('bench-cached', cached=True), False),
+                ('cached + warm', make_backend('bench-warm', cached=True), True),
+            ):
+                if warm:
+                    for template_name in warmup.template_names(backend.engine):
+                        backend.engine.get_template(template_name)
+                timings = []
+                for _ in range(renders + 1):
+                    start = time.perf_counter()
+                    # Loading is part of every render: that is where the uncached loader re-parses
+                    backend.get_template(name).render({}, request)
+                    timings.append((time.perf_counter() - start) * 1000)
+                first, rest = timings[0], sorted(timings[1:])
+                self.stdout.write(
+                    f"{name:<34} {config:<16} {first:>9.2f} "
+                    f"{instrumentation.percentile(rest, 50):>8.3f} {instrumentation.percentile(rest, 95):>8.3f}"
+                )
@@ -0,0 +1,245 @@
+import json
+import logging
+import platform
+import tempfile
+import time
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from hospital import instrumentation, invoices, models, seeding
+from hospital.seeding import SEED_PASSWORD
+
+PREFIX = 'bench'
+
+
+class Workflows:
+    """The hospital's main request flows, driven through the test client against seeded data."""
+
+    def __init__(self, iterations):
+        self.admin = self._client(User.objects.get(username=f"{PREFIX}_admin_0"))
+        self.doctors = list(models.Doctor.objects.select_related('user').order_by('id')[:iterations])
+        self.patients = list(models.Patient.objects.select_related('user').order_by('id')[:iterations])
+        # Sessions are opened up front so logging in is not measured as part of each workflow
+        self.doctor_clients = [self._client(doctor.user) for doctor in self.doctors]
+        self.patient_clients = [self._client(patient.user) for patient in self.patients]
+        self.pending_appointments = list(
+            models.Appointment.objects.filter(status='Pending').order_by('id').values_list('id', flat=True))
+        self.pending_records = list(
+            models.MedicalRecord.objects.filter(status='pending').order_by('id').values_list('id', flat=True))
+        self.pharmacies = list(models.Pharmacy.objects.order_by('id').values_list('id', flat=True))
+        discharged = set(models.PatientDischargeDetails.objects.values_list('patientId', flat=True))
+        self.discharged = sorted(discharged)
+        # discharge_patient_view expects the patient to occupy a ward room
+        self.admitted = list(models.WardRoom.objects.filter(assigned_patient__isnull=False)
+                             .exclude(assigned_patient_id__in=discharged)
+                             .order_by('id').values_list('assigned_patient_id', flat=True))
+        self.medicine = models.PharmacyStock.objects.order_by('medicine').values_list('medicine', flat=True).first()
+
+    def _client(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def doctor_client(self, i):
+        i %= len(self.doctors)
+        return self.doctors[i], self.doctor_clients[i]
+
+    def patient_client(self, i):
+        i %= len(self.patients)
+        return self.patients[i], self.patient_clients[i]
+
+    # Each workflow performs one iteration and returns the responses it got
+    def login(self, i):
+        patient = self.patients[i % len(self.patients)]
+        client = Client()
+        login = client.post('/patientlogin', {'username': patient.user.username, 'password': SEED_PASSWORD})
+        return [login, client.get('/afterlogin')]
+
+    def admin_dashboard(self, i):
+        return [self.admin.get('/admin-dashboard')]
+
+    def doctor_dashboard(self, i):
+        return [self.doctor_client(i)[1].get('/doctor-dashboard')]
+
+    def patient_dashboard(self, i):
+        return [self.patient_client(i)[1].get('/patient-dashboard')]
+
+    def book_appointment(self, i):
+        patient, client = self.patient_client(i)
+        return [client.post('/patient-book-appointment', {
+            'doctorId': patient.assignedDoctorId,
+            'description': 'Benchmark booking',
+            'appointmentDate': (timezone.localtime() + timedelta(days=7)).strftime('%Y-%m-%dT%H:%M'),
+        })]
+
+    def approve_appointment(self, i):
+        return [self.admin.get(f'/approve-appointment/{self.pending_appointments.pop()}')]
+
+    def add_medical_record(self, i):
+        doctor, client = self.doctor_client(i)
+        patient = self.patients[i % len(self.patients)]
+        return [client.post(f'/doctor/patient/{patient.pk}/add-record/', {
+            'diagnosis': 'Benchmark diagnosis',
+            'prescribed_treatment': [self.medicine.lower()],
+            'treatment_quantities': '[1]',
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '0',
+            'form-MIN_NUM_FORMS': '0',
+            'form-MAX_NUM_FORMS': '1000',
+            'form-0-test': 'Blood Sugar',
+            'form-0-result': '100',
+        })]
+
+    def dispense(self, i):
+        return [self.admin.post('/admin-dispense-medication', {
+            'pharmacy': self.pharmacies[i % len(self.pharmacies)],
+            'prescription': self.pending_records.pop(),
+        })]
+
+    def discharge(self, i):
+        return [self.admin.post(f'/discharge-patient/{self.admitted.pop()}', {
+            'roomCharge': '300', 'doctorFee': '500', 'OtherCharge': '50', 'medicineCost': '120',
+        })]
+
+    def pdf_download(self, i):
+        response = self.admin.get(f'/download-pdf/{self.discharged[i % len(self.discharged)]}')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return [response]
+
+    # name -> (method, queryset whose growth proves the writes happened)
+    def all(self):
+        return {
+            'login': (self.login, None),
+            'admin_dashboard': (self.admin_dashboard, None),
+            'doctor_dashboard': (self.doctor_dashboard, None),
+            'patient_dashboard': (self.patient_dashboard, None),
+            'book_appointment': (self.book_appointment, models.Appointment.objects.all()),
+            'approve_appointment': (self.approve_appointment, models.Appointment.objects.filter(status='Approved')),
+            'add_medical_record': (self.add_medical_record, models.MedicalRecord.objects.all()),
+            'dispense': (self.dispense, models.MedicalRecord.objects.filter(status='dispensed')),
+            'discharge': (self.discharge, models.PatientDischargeDetails.objects.all()),
+            'pdf_download': (self.pdf_download, None),
+        }
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway database with a synthetic hospital, drive the main workflows through "
+            "the test client and report throughput, latency percentiles and queries per request as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--patients', type=int, default=500)
+        parser.add_argument('--appointments', type=int, default=5000)
+        parser.add_argument('--records', type=int, default=2000)
+        parser.add_argument('--pharmacies', type=int, default=3)
+        parser.add_argument('--medicines', type=int, default=50)
+        parser.add_argument('--wards', type=int, default=200)
+        parser.add_argument('--discharged', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=50, help="Iterations per workflow.")
+        parser.add_argument('--workflows', default='', help="Comma-separated subset of workflows to run.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic data.")
+        parser.add_argument('--output', default='benchmark.json', help="File the JSON results are written to.")
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the benchmark database between runs.")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        # Write workflows consume seeded rows: ward occupants, pending records and appointments
+        if iterations > min(options['wards'] // 2, options['records'] // 2, options['appointments'] // 10):
+            raise CommandError("--iterations is larger than the seeded data can support for the write workflows.")
+
+        # One metrics log line per request would drown the report
+        logging.getLogger('hospital.metrics').setLevel(logging.ERROR)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        # Keep benchmark invoices out of HOSPITAL_INVOICE_ROOT
+        invoice_root, invoices.INVOICE_ROOT = invoices.INVOICE_ROOT, tempfile.mkdtemp(prefix='hospital-bench-')
+        try:
+            start = time.perf_counter()
+            seeder = seeding.HospitalSeeder(
+                doctors=options['doctors'], patients=options['patients'], appointments=options['appointments'],
+                records=options['records'], pharmacies=options['pharmacies'], medicines=options['medicines'],
+                wards=options['wards'], discharged=options['discharged'], seed=options['seed'], prefix=PREFIX,
+            )
+            seeded = seeder.run()
+            seed_seconds = time.perf_counter() - start
+            self.stdout.write(f"Seeded {seeded} in {seed_seconds:.2f}s")
+
+            workflows = Workflows(iterations).all()
+            selected = [name.strip() for name in options['workflows'].split(',') if name.strip()] or list(workflows)
+            unknown = set(selected) - set(workflows)
+            if unknown:
+                raise CommandError(f"Unknown workflows: {', '.join(sorted(unknown))}")
+
+            results = {}
+            for name in selected:
+                results[name] = self.run_workflow(*workflows[name], iterations)
+                self.stdout.write(self.format_row(name, results[name]))
+            invoices.wait()
+        finally:
+            invoices.INVOICE_ROOT = invoice_root
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'options': {key: options[key] for key in (
+                'doctors', 'patients', 'appointments', 'records', 'pharmacies', 'medicines',
+                'wards', 'discharged', 'iterations', 'seed')},
+            'seed_seconds': round(seed_seconds, 3),
+            'workflows': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_workflow(self, workflow, effect, iterations):
+        before = effect.count() if effect is not None else None
+        latencies, queries, requests, errors = [], [], 0, 0
+        total_start = time.perf_counter()
+        for i in range(iterations):
+            metrics = instrumentation.RequestMetrics()
+            start = time.perf_counter()
+            with connection.execute_wrapper(metrics):
+                responses = workflow(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(metrics.queries)
+            requests += len(responses)
+            errors += sum(1 for response in responses if response.status_code >= 400)
+        elapsed = time.perf_counter() - total_start
+
+        latencies.sort()
+        result = {
+            'iterations': iterations,
+            'requests': requests,
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'iterations_per_second': round(iterations / elapsed, 2),
+            'latency_ms': {f'p{p}': round(instrumentation.percentile(latencies, p), 2) for p in instrumentation.PERCENTILES},
+            'queries_per_request': round(sum(queries) / requests, 2),
+            'max_queries_per_iteration': max(queries),
+        }
+        if effect is not None:
+            result['rows_changed'] = effect.count() - before
+        return result
+
+    def format_row(self, name, result):
+        latency = result['latency_ms']
+        row = (f"{name:<20} {result['iterations_per_second']:>8.1f} it/s  p50 {latency['p50']:>8.2f}ms  "
+               f"p95 {latency['p95']:>8.2f}ms  p99 {latency['p99']:>8.2f}ms  "
+               f"{result['queries_per_request']:>6.1f} q/req  errors {result['errors']}")
+        if 'rows_changed' in result:
+            row += f"  rows {result['rows_changed']}"
+        return row
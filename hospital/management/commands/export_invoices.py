@@ -0,0 +1,47 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hospital import invoices, models
+
+
+class Command(BaseCommand):
+    help = "Render the invoices of every patient discharged in a date range into one ZIP file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat, required=True,
+                            help="First release date to include (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat, default=None,
+                            help="Last release date to include (YYYY-MM-DD), defaults to today.")
+        parser.add_argument('--output', default=None, help="ZIP file to write.")
+        parser.add_argument('--kind', choices=sorted(invoices.RENDERERS), default='bill',
+                            help="'bill' is the patient invoice, 'summary' the admin bill.")
+        parser.add_argument('--workers', type=int, default=invoices.EXPORT_WORKERS,
+                            help="Rendering processes.")
+
+    def handle(self, *args, **options):
+        date_from = options['date_from']
+        date_to = options['date_to'] or date.today()
+        if date_to < date_from:
+            raise CommandError("--to must not be before --from.")
+        output = options['output'] or f"invoices_{date_from}_{date_to}.zip"
+
+        discharges = models.PatientDischargeDetails.objects.filter(releaseDate__range=(date_from, date_to))
+        stats = {}
+        jobs = invoices.export_jobs(discharges, kind=options['kind'], stats=stats)
+        start = time.perf_counter()
+        with open(output, 'wb') as f:
+            for chunk in invoices.stream_invoice_zip(jobs, options['kind'], options['workers'], stats):
+                f.write(chunk)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"Wrote {stats['written']} invoices to {output} on {options['workers']} workers in {elapsed:.3f}s "
+            f"({stats['written'] / elapsed:,.1f} invoices/s), failed: {stats['failed']}, "
+            f"without a bill for the stay: {stats.get('unbilled', 0)}"
+        )
+        if stats.get('unbilled'):
+            self.stderr.write(self.style.WARNING("Some discharges have no bill for their stay and were left out."))
+        if stats['failed']:
+            self.stderr.write(self.style.ERROR("Some invoices could not be rendered."))
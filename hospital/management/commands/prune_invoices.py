@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from hospital import invoices
+
+
+class Command(BaseCommand):
+    help = ("Delete invoice PDFs that a newer render of the same bill replaced, once they are old enough that "
+            "no download or export can still be reading them. Meant to run periodically, e.g. from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=invoices.PRUNE_AFTER,
+                            help="Seconds a superseded render is kept.")
+
+    def handle(self, *args, **options):
+        removed = invoices.prune(options['older_than'])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} superseded invoice files"))
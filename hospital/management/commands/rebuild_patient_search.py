@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital import search
+
+
+class Command(BaseCommand):
+    help = ("Recompute every patient's search document. Signals keep the documents current, so this is only "
+            "needed after bulk imports or raw SQL changes that bypassed them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=search.BATCH_SIZE,
+                            help="Patients indexed per transaction.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = search.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {total} patients in {time.perf_counter() - start:.1f}s"))
@@ -0,0 +1,69 @@
+import secrets
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from hospital import seeding
+
+
+class Command(BaseCommand):
+    help = ("Fill the database with a synthetic hospital: doctors, patients, appointments, medical records, "
+            "pharmacies, wards, discharges and bills, inserted in batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=100)
+        parser.add_argument('--patients', type=int, default=10000)
+        parser.add_argument('--appointments', type=int, default=100000)
+        parser.add_argument('--records', type=int, default=20000)
+        parser.add_argument('--pharmacies', type=int, default=5)
+        parser.add_argument('--medicines', type=int, default=50)
+        parser.add_argument('--wards', type=int, default=500)
+        parser.add_argument('--discharged', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument('--prefix', default='seed',
+                            help="Prefix of usernames, pharmacy and ward codes, so several data sets can coexist.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT transaction.")
+        parser.add_argument('--password', help="Password shared by every seeded user; a random one is generated "
+                                               "and printed when omitted.")
+        parser.add_argument('--force', action='store_true', help="Seed even though the production profile is active.")
+
+    def handle(self, *args, **options):
+        if settings.PRODUCTION and not options['force']:
+            raise CommandError("Refusing to seed a production database; pass --force if this is really intended.")
+        if options['doctors'] < 1 and (options['patients'] or options['appointments'] or options['records']):
+            raise CommandError("Patients, appointments and records need at least one doctor.")
+        if options['patients'] < 1 and (options['appointments'] or options['records']):
+            raise CommandError("Appointments and records need at least one patient.")
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Users prefixed '{options['prefix']}_' already exist; pick another --prefix.")
+
+        password = options['password'] or secrets.token_urlsafe(12)
+        self.started = self.table_started = self.last_report = time.perf_counter()
+        seeder = seeding.HospitalSeeder(
+            doctors=options['doctors'], patients=options['patients'], appointments=options['appointments'],
+            records=options['records'], pharmacies=options['pharmacies'], medicines=options['medicines'],
+            wards=options['wards'], discharged=options['discharged'], seed=options['seed'],
+            prefix=options['prefix'], batch_size=options['batch_size'], password=password,
+            progress=self.progress,
+        )
+        counts = seeder.run()
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {', '.join(f'{count:,} {name}' for name, count in counts.items())} in {elapsed:.1f}s"
+        ))
+        if not options['password']:
+            self.stdout.write(f"Seeded users log in with the password: {password}")
+
+    def progress(self, label, done, total):
+        now = time.perf_counter()
+        # One line per second at most, plus one when a table is finished
+        if done < total and now - self.last_report < 1:
+            return
+        self.last_report = now
+        rate = done / max(now - self.table_started, 1e-6)
+        self.stdout.write(f"{label}: {done:,}/{total:,} ({done * 100 // total}%) {rate:,.0f} rows/s")
+        if done >= total:
+            self.table_started = now
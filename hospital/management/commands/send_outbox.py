@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital import outbox
+
+
+class Command(BaseCommand):
+    help = ("Send queued emails in batches over one mail connection, retrying failures with backoff. "
+            "Runs one pass, or keeps polling with --loop.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE, help="Emails per connection.")
+        parser.add_argument('--loop', action='store_true', help="Keep running and poll for new emails.")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds between polls when idle.")
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is due before going idle
+            while True:
+                sent, retried, failed = outbox.send_batch(options['batch_size'])
+                if sent or retried or failed:
+                    self.stdout.write(f"Sent {sent}, will retry {retried}, gave up on {failed}")
+                if sent + retried + failed < options['batch_size']:
+                    break
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
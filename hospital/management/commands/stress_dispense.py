@@ -0,0 +1,63 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from hospital.models import MedicalRecord, Pharmacy
+
+MEDICINE = 'Stressamol'
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent dispenses against one throwaway pharmacy and check that "
+        "no stock decrement is lost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dispenses', type=int, default=200, help="Total dispense calls.")
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent dispensing threads.")
+        parser.add_argument('--quantity', type=int, default=1, help="Units taken by each dispense.")
+
+    def handle(self, *args, **options):
+        dispenses, workers, quantity = options['dispenses'], options['workers'], options['quantity']
+        initial_stock = dispenses * quantity + 1
+        pharmacy = Pharmacy.objects.create(pharmacy_id=f"S{uuid.uuid4().hex[:9]}")
+        pharmacy.update_medicine_list(MEDICINE, initial_stock, 1)
+        # Dispensing only reads the prescription, so it does not have to be saved
+        prescription = MedicalRecord(
+            prescribed_treatment=MEDICINE,
+            treatment_quantities=f"{MEDICINE}: {quantity}",
+        )
+
+        def dispense(_):
+            try:
+                # Each call starts from its own, possibly stale, copy of the pharmacy row
+                success, result = Pharmacy.objects.get(pk=pharmacy.pk).dispense_medication(prescription)
+                return success
+            finally:
+                connection.close()
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                succeeded = sum(pool.map(dispense, range(dispenses)))
+            elapsed = time.perf_counter() - start
+
+            pharmacy.refresh_from_db()
+            final = pharmacy.check_stock(MEDICINE)
+            expected = initial_stock - succeeded * quantity
+            self.stdout.write(
+                f"{succeeded}/{dispenses} dispenses succeeded on {workers} workers in {elapsed:.3f}s; "
+                f"stock {initial_stock} -> {final} (expected {expected})"
+            )
+        finally:
+            pharmacy.delete()
+
+        if final != expected:
+            raise CommandError(f"Lost stock updates: final quantity {final}, expected {expected}")
+        if succeeded != dispenses:
+            raise CommandError(f"Only {succeeded} of {dispenses} dispenses succeeded")
+        self.stdout.write(self.style.SUCCESS("Stock is consistent."))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hospital import warmup
+
+
+class Command(BaseCommand):
+    help = ("Compile every template and report the ones that do not compile. The web server warms its own "
+            "cache at startup when HOSPITAL_WARM_TEMPLATES is set; run this in CI or before a deploy.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        compiled, failed = warmup.warm_templates()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"Compiled {compiled} templates in {elapsed * 1000:.1f}ms")
+        if failed:
+            for name, error in failed:
+                self.stderr.write(f"{name}: {error}")
+            raise CommandError(f"{len(failed)} templates do not compile.")
+        self.stdout.write(self.style.SUCCESS("All templates compile."))
@@ -0,0 +1,84 @@
+# hospital/middleware.py
+from django.utils.functional import SimpleLazyObject
+
+from . import identity, instrumentation, replicas, roles
+
+
+class HospitalRoleMiddleware:
+    """Resolve the logged-in user's role once and expose it as request.hospital_role."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.hospital_role = roles.get_role(request.user)
+        return self.get_response(request)
+
+
+class IdentityMapMiddleware:
+    """
+    Give each request its own identity map and expose the user's profile as request.hospital_profile.
+
+    The profile is the Doctor or Patient row of the logged-in user's primary
+    role (None for other roles), loaded on first use. Views read it through
+    current_doctor()/current_patient(), and model helpers that go through
+    hospital.identity share the same row instead of querying it again.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = identity.activate()
+        try:
+            role = getattr(request, 'hospital_role', None)
+            if role == roles.DOCTOR:
+                request.hospital_profile = SimpleLazyObject(lambda: identity.doctor_for_user(request.user.id))
+            elif role == roles.PATIENT:
+                request.hospital_profile = SimpleLazyObject(lambda: identity.patient_for_user(request.user.id))
+            else:
+                request.hospital_profile = None
+            return self.get_response(request)
+        finally:
+            identity.deactivate(token)
+
+
+class MetricsMiddleware:
+    """
+    Record query count, SQL time, template time, latency and response size for every view.
+
+    Samples feed the rolling percentiles on the admin metrics page and one JSON
+    line on the 'hospital.metrics' logger. Views over their query budget are
+    logged as warnings, or fail when HOSPITAL_QUERY_BUDGET_STRICT is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrumentation.install_template_timer()
+
+    def __call__(self, request):
+        response, metrics, elapsed = instrumentation.measure(request, self.get_response)
+        instrumentation.record(request, response, metrics, elapsed)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """
+    Keep a user's reads on the primary for a few seconds after a request of theirs wrote.
+
+    Replicas lag behind the primary, so without this a user could save a form
+    and be redirected to a listing served from a replica that has not seen it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token, recorder = replicas.track_writes()
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.stop_tracking(token)
+        if recorder['wrote'] and replicas.replica_configured() and request.user.is_authenticated:
+            replicas.pin_to_primary(request)
+        return response
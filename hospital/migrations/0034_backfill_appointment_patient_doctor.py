@@ -0,0 +1,47 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def backfill_appointment_relations(apps, schema_editor):
+    """Point Appointment.patient/doctor at the rows behind the legacy user-id columns, in chunks."""
+    Appointment = apps.get_model('hospital', 'Appointment')
+    Doctor = apps.get_model('hospital', 'Doctor')
+    Patient = apps.get_model('hospital', 'Patient')
+
+    doctors = dict(Doctor.objects.values_list('user_id', 'id'))
+    patients = dict(Patient.objects.values_list('user_id', 'id'))
+
+    last_pk = 0
+    while True:
+        batch = list(
+            Appointment.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'patientId', 'doctorId', 'patient', 'doctor')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        changed = []
+        for appointment in batch:
+            doctor_id = doctors.get(appointment.doctorId)
+            patient_id = patients.get(appointment.patientId)
+            if doctor_id != appointment.doctor_id or patient_id != appointment.patient_id:
+                appointment.doctor_id = doctor_id
+                appointment.patient_id = patient_id
+                changed.append(appointment)
+        if changed:
+            Appointment.objects.bulk_update(changed, ['doctor', 'patient'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Commit each chunk on its own so large tables are not locked for the whole backfill
+    atomic = False
+
+    dependencies = [
+        ('hospital', '0033_appointment_patient_doctor_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_appointment_relations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+def create_sequences(apps, schema_editor):
+    IdSequence = apps.get_model('hospital', 'IdSequence')
+    for name in ('medical_record', 'billing'):
+        IdSequence.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0034_backfill_appointment_patient_doctor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(create_sequences, migrations.RunPython.noop),
+    ]
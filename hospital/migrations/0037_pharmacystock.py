@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:38
+
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def explode_available_medicines(apps, schema_editor):
+    """Turn each pharmacy's available_medicines JSON into PharmacyStock rows."""
+    Pharmacy = apps.get_model('hospital', 'Pharmacy')
+    PharmacyStock = apps.get_model('hospital', 'PharmacyStock')
+
+    rows = []
+    for pharmacy in Pharmacy.objects.exclude(available_medicines=None).iterator():
+        merged = {}
+        for name, item in (pharmacy.available_medicines or {}).items():
+            name = str(name).strip()
+            if not name or not isinstance(item, dict):
+                continue
+            try:
+                quantity = max(int(item.get('quantity', 0)), 0)
+                price = Decimal(str(item.get('price', 0))).quantize(Decimal('0.01'))
+            except (TypeError, ValueError, InvalidOperation):
+                continue
+            # Names differing only in case collapse into one row, as the unique index requires
+            row = merged.setdefault(name.lower(), PharmacyStock(pharmacy_id=pharmacy.pk, medicine=name, quantity=0))
+            row.quantity += quantity
+            row.price = price
+        rows.extend(merged.values())
+        if len(rows) >= BATCH_SIZE:
+            PharmacyStock.objects.bulk_create(rows)
+            rows = []
+    PharmacyStock.objects.bulk_create(rows)
+
+
+def collapse_stock_rows(apps, schema_editor):
+    Pharmacy = apps.get_model('hospital', 'Pharmacy')
+    PharmacyStock = apps.get_model('hospital', 'PharmacyStock')
+
+    medicines = {}
+    for item in PharmacyStock.objects.iterator():
+        medicines.setdefault(item.pharmacy_id, {})[item.medicine] = {
+            'quantity': item.quantity,
+            'price': float(item.price),
+        }
+    for pharmacy_id, stock in medicines.items():
+        Pharmacy.objects.filter(pk=pharmacy_id).update(available_medicines=stock)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0035_idsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PharmacyStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('medicine', models.CharField(max_length=100)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='hospital.pharmacy')),
+            ],
+            options={
+                'ordering': ['medicine'],
+                'constraints': [models.UniqueConstraint(models.F('pharmacy'), django.db.models.functions.text.Lower('medicine'), name='pharmacystock_pharmacy_medicine_ci_uniq')],
+            },
+        ),
+        migrations.RunPython(explode_available_medicines, collapse_stock_rows),
+        migrations.RemoveField(
+            model_name='pharmacy',
+            name='available_medicines',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0037_pharmacystock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['created_at', 'id'], name='medrec_created_idx'),
+        ),
+    ]
@@ -0,0 +1,138 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:14
+
+import django.db.models.deletion
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+RECENT_DIAGNOSES = 5
+COUNTRY_CODE = '20'
+
+# Tokens a search is narrowed by: "doctor<user id><status>" for one doctor's patients
+# (doctor12active) and the bare status for everyone's
+SCOPE = ("'doctor' || coalesce({row}.doctor_user_id, 'none') || "
+         "CASE WHEN {row}.active THEN 'active active' ELSE 'inactive inactive' END")
+FTS_INSERT = """INSERT INTO hospital_patientsearch_fts(rowid, scope, name, contact, symptoms, diagnoses)
+        VALUES (new.patient_id, {scope}, new.name, new.contact, new.symptoms, new.diagnoses);""".format(
+    scope=SCOPE.format(row='new'))
+# A contentless table forgets the text, so removing a row repeats the values it was indexed with
+FTS_DELETE = """INSERT INTO hospital_patientsearch_fts(hospital_patientsearch_fts, rowid, scope, name, contact, symptoms, diagnoses)
+        VALUES ('delete', old.patient_id, {scope}, old.name, old.contact, old.symptoms, old.diagnoses);""".format(
+    scope=SCOPE.format(row='old'))
+
+SQLITE_INDEX = [
+    # Contentless FTS5 table: the text lives once, in the document table. Prefix indexes
+    # on 2 and 3 characters keep type-ahead queries cheap.
+    """CREATE VIRTUAL TABLE hospital_patientsearch_fts USING fts5(
+        scope, name, contact, symptoms, diagnoses, content='',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER hospital_patientsearch_ai AFTER INSERT ON hospital_patientsearchdocument BEGIN
+        {FTS_INSERT}
+    END""",
+    f"""CREATE TRIGGER hospital_patientsearch_ad AFTER DELETE ON hospital_patientsearchdocument BEGIN
+        {FTS_DELETE}
+    END""",
+    f"""CREATE TRIGGER hospital_patientsearch_au AFTER UPDATE ON hospital_patientsearchdocument BEGIN
+        {FTS_DELETE}
+        {FTS_INSERT}
+    END""",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS hospital_patientsearch_au',
+    'DROP TRIGGER IF EXISTS hospital_patientsearch_ad',
+    'DROP TRIGGER IF EXISTS hospital_patientsearch_ai',
+    'DROP TABLE IF EXISTS hospital_patientsearch_fts',
+]
+# hospital.search.TSVECTOR queries this exact expression
+POSTGRESQL_INDEX = [
+    """CREATE INDEX patsearch_fts_idx ON hospital_patientsearchdocument USING GIN ((
+        setweight(to_tsvector('simple', name), 'A') ||
+        setweight(to_tsvector('simple', contact), 'B') ||
+        setweight(to_tsvector('simple', symptoms), 'C') ||
+        setweight(to_tsvector('simple', diagnoses), 'D')
+    ))""",
+]
+POSTGRESQL_DROP = ['DROP INDEX IF EXISTS patsearch_fts_idx']
+
+
+def create_fulltext_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRESQL_INDEX}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def build_documents(apps, schema_editor):
+    """Index the existing patients; hospital.search keeps the documents current from here on."""
+    Patient = apps.get_model('hospital', 'Patient')
+    MedicalRecord = apps.get_model('hospital', 'MedicalRecord')
+    Document = apps.get_model('hospital', 'PatientSearchDocument')
+
+    last_pk = 0
+    while True:
+        patients = list(Patient.objects.filter(pk__gt=last_pk).order_by('pk').select_related('user')[:BATCH_SIZE])
+        if not patients:
+            break
+        recent = {}
+        rows = (
+            MedicalRecord.objects.filter(patient_id__in=[patient.pk for patient in patients])
+            .order_by('patient_id', '-created_at', '-id').values_list('patient_id', 'diagnosis')
+        )
+        for patient_id, diagnosis in rows:
+            diagnoses = recent.setdefault(patient_id, [])
+            if len(diagnoses) < RECENT_DIAGNOSES:
+                diagnoses.append(diagnosis)
+        documents = []
+        for patient in patients:
+            # As hospital.search.phone_forms(): as typed, digits only and the national form
+            mobile = (patient.mobile or '').strip()
+            digits = re.sub(r'\D', '', mobile)
+            international = digits[2:] if mobile.startswith('00') else digits if mobile.startswith('+') else ''
+            national = '0' + international[len(COUNTRY_CODE):] if international.startswith(COUNTRY_CODE) else ''
+            phones = list(dict.fromkeys(form for form in (mobile, digits, national) if form))
+            emails = sorted({email for email in (patient.email, patient.user.email) if email})
+            documents.append(Document(
+                patient_id=patient.pk,
+                doctor_user_id=patient.assignedDoctorId,
+                active=patient.status,
+                name=f"{patient.user.first_name} {patient.user.last_name}".strip(),
+                contact=' '.join([*phones, *emails]),
+                symptoms=patient.symptoms or '',
+                diagnoses='\n'.join(recent.get(patient.pk, [])),
+            ))
+        Document.objects.bulk_create(documents)
+        last_pk = patients[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0039_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientSearchDocument',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='hospital.patient')),
+                ('doctor_user_id', models.PositiveIntegerField(null=True)),
+                ('active', models.BooleanField(default=False)),
+                ('name', models.TextField(blank=True)),
+                ('contact', models.TextField(blank=True)),
+                ('symptoms', models.TextField(blank=True)),
+                ('diagnoses', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor_user_id', 'active'], name='patsearch_doctor_idx')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -2,10 +2,13 @@ import django
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models import JSONField
+from django.db import transaction
+from django.db.models import JSONField, F
+from django.db.models.functions import Lower
 import json
 from django.core.exceptions import ValidationError
 from multipledispatch import dispatch
+from . import catalogue, identity, ids
 
 departments = [
     ('Cardiologist', 'Cardiologist'),
@@ -55,7 +58,7 @@ class Doctor(HospitalEntity):
 
     def diagnose_patient(self, patient, diagnosis):
         record = MedicalRecord.objects.create(
-            record_id=f"REC{timezone.now().strftime('%Y%m%d%H%M%S')}",
+            record_id=ids.next_record_id(),
             patient=patient,
             doctor=self,
             diagnosis=diagnosis
@@ -112,7 +115,7 @@ class Patient(HospitalEntity):
             "mobile": self.mobile,
             "email": self.email,
             "symptoms": self.symptoms,
-            "assigned_doctor": self.assignedDoctorId and Doctor.objects.get(user_id=self.assignedDoctorId).get_name
+            "assigned_doctor": self.assignedDoctorId and identity.doctor_for_user(self.assignedDoctorId).get_name
         }
 
     def update_status(self):
@@ -121,6 +124,8 @@ class Patient(HospitalEntity):
 
     def book_appointment(self, doctor, date, description):
         appointment = Appointment.objects.create(
+            patient=self,
+            doctor=doctor,
             patientId=self.user.id,
             doctorId=doctor.user.id,
             patientName=self.get_name,
@@ -174,16 +179,64 @@ class Appointment(models.Model):
         ('Completed', 'Completed'),
     )
 
+    # Legacy columns: patientId/doctorId hold the *User* ids. They stay readable and are kept
+    # in sync with the patient/doctor foreign keys below until every caller uses the relations.
     patientId = models.PositiveIntegerField(null=True)
     doctorId = models.PositiveIntegerField(null=True)
     patientName = models.CharField(max_length=40, null=True)
     doctorName = models.CharField(max_length=40, null=True)
+    patient = models.ForeignKey('Patient', on_delete=models.SET_NULL, null=True, blank=True, related_name='appointments')
+    doctor = models.ForeignKey('Doctor', on_delete=models.SET_NULL, null=True, blank=True, related_name='appointments')
     appointmentDate = models.DateTimeField(null=True, blank=True)
     description = models.TextField(max_length=500)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'status', 'appointmentDate'], name='appt_doctor_status_date_idx'),
+            models.Index(fields=['patient', 'status'], name='appt_patient_status_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_relations = instance._relation_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.sync_relations()
+        super().save(*args, **kwargs)
+        self._loaded_relations = self._relation_values()
+
+    def _relation_values(self):
+        # Read from __dict__ so a deferred field is not fetched just to compare it
+        return {name: self.__dict__.get(name) for name in ('doctorId', 'doctor_id', 'patientId', 'patient_id')}
+
+    def sync_relations(self):
+        """
+        Keep each legacy user id and its foreign key pointing at the same person.
+
+        Whichever side was changed since the row was loaded wins; on a new row
+        the legacy id does. Only save() runs this, so queryset .update() and
+        bulk_create callers must set both sides themselves.
+        """
+        self._sync_relation('doctor', 'doctorId', Doctor)
+        self._sync_relation('patient', 'patientId', Patient)
+
+    def _sync_relation(self, field, legacy, model):
+        legacy_value, fk_id = getattr(self, legacy), getattr(self, f'{field}_id')
+        loaded = getattr(self, '_loaded_relations', None)
+        legacy_changed = loaded is None or legacy_value != loaded[legacy]
+        fk_changed = loaded is None or fk_id != loaded[f'{field}_id']
+        if not legacy_changed and not fk_changed:
+            return
+        if fk_id is not None and (not legacy_value or not legacy_changed):
+            setattr(self, legacy, getattr(self, field).user_id)
+        elif legacy_value and (fk_id is None or getattr(self, field).user_id != legacy_value):
+            setattr(self, field, model.objects.filter(user_id=legacy_value).first())
+
     def schedule_appointment(self):
         if self.status == "Pending":
             self.status = "Approved"
@@ -289,7 +342,7 @@ class BillingManager:
 
     def create_bill(self, patient, medical_record, treatment_cost, medicine_cost):
         bill = Billing.objects.create(
-            bill_id=f"BILL{timezone.now().strftime('%Y%m%d%H%M%S')}",
+            bill_id=ids.next_bill_id(),
             patient=patient,
             medical_record=medical_record,
             treatment_cost=treatment_cost,
@@ -314,6 +367,11 @@ class Billing(models.Model):
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        if not self.bill_id:
+            self.bill_id = ids.next_bill_id()
+        super().save(*args, **kwargs)
+
     def generate_bill(self, treatment_cost=0, medicine_cost=0):
         self.treatment_cost += treatment_cost
         self.medicine_cost += medicine_cost
@@ -346,9 +404,22 @@ class Billing(models.Model):
 class Pharmacy(models.Model):
     pharmacy_id = models.CharField(max_length=10, unique=True)
     pharmacist = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    available_medicines = models.JSONField(default=dict, blank=True, null=True)
     prescriptions_list = models.ManyToManyField('MedicalRecord', blank=True)
 
+    @property
+    def available_medicines(self):
+        """Stock as {name: {"quantity": ..., "price": ...}}; uses prefetch_related('stock') when present."""
+        return {
+            item.medicine: {"quantity": item.quantity, "price": float(item.price)}
+            for item in self.stock.all()
+        }
+
+    def _stock_item(self, medicine):
+        # Matches the case-insensitive (pharmacy, LOWER(medicine)) unique index
+        return PharmacyStock.objects.alias(medicine_lower=Lower('medicine')).filter(
+            pharmacy=self, medicine_lower=medicine.strip().lower()
+        )
+
     # Concept: Exception Handling - Handle errors during medication dispensing
     def dispense_medication(self, prescription):
         try:
@@ -380,48 +451,78 @@ class Pharmacy(models.Model):
         except (json.JSONDecodeError, ValidationError, ValueError) as e:
             return False, {"error": str(e)}
 
-        available_meds = {k.lower(): v for k, v in (self.available_medicines or {}).items()}
-        dispensed_items = []
-
-        for med, qty in zip(medicines, quantities):
-            med_lower = med.lower()
-            if med_lower not in available_meds:
-                return False, {"error": f"Medicine {med} not found in pharmacy stock"}
-            stock_quantity = available_meds[med_lower].get('quantity', 0)
-            if stock_quantity < qty:
-                return False, {"error": f"Insufficient stock for {med}: required {qty}, available {stock_quantity}"}
-
-            original_key = next((k for k in self.available_medicines.keys() if k.lower() == med_lower), None)
-            if not original_key:
-                return False, {"error": f"Could not find original key for {med}"}
-            price = self.available_medicines[original_key]['price']
-            self.available_medicines[original_key]['quantity'] -= qty
-            if self.available_medicines[original_key]['quantity'] <= 0:
-                del self.available_medicines[original_key]
-            dispensed_items.append({
-                "name": med,
-                "quantity": qty,
-                "price": price
-            })
-
-        self.save()
+        try:
+            with transaction.atomic():
+                dispensed_items = [self._take_medicine(med, qty) for med, qty in zip(medicines, quantities)]
+        except ValidationError as e:
+            return False, {"error": e.message}
         return True, dispensed_items
 
+    # Concept: Atomic Updates - each decrement is a single conditional UPDATE, so parallel
+    # dispenses can never overwrite each other's stock changes
+    def _take_medicine(self, medicine, quantity):
+        # Write first: reading before writing inside the transaction would make SQLite
+        # upgrade a shared lock, which deadlocks concurrent dispenses
+        updated = self._stock_item(medicine).filter(quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity
+        )
+        item = self._stock_item(medicine).first()
+        if item is None:
+            raise ValidationError(f"Medicine {medicine} not found in pharmacy stock")
+        if not updated:
+            raise ValidationError(f"Insufficient stock for {medicine}: required {quantity}, available {item.quantity}")
+        if item.quantity <= 0:
+            item.delete()
+        return {
+            "name": medicine,
+            "quantity": quantity,
+            "price": float(item.price)
+        }
+
     def check_stock(self, medicine):
-        return self.available_medicines.get(medicine, {"quantity": 0}).get("quantity", 0)
+        return self._stock_item(medicine).values_list('quantity', flat=True).first() or 0
 
     def update_medicine_list(self, medicine, quantity, price):
         if quantity < 0:
             return False
-        if not self.available_medicines:
-            self.available_medicines = {}
-        self.available_medicines[medicine] = {"quantity": quantity, "price": float(price)}
-        self.save()
+        with transaction.atomic():
+            if not self._stock_item(medicine).update(quantity=quantity, price=price):
+                PharmacyStock.objects.create(pharmacy=self, medicine=medicine.strip(), quantity=quantity, price=price)
         return True
 
+    def replace_stock(self, medicines):
+        """Replace the whole stock with {name: {"quantity": ..., "price": ...}}."""
+        names = [name.strip().casefold() for name in (medicines or {})]
+        if len(names) != len(set(names)):
+            # The stock table is unique on the lower-cased name; fail before bulk_create does
+            raise ValidationError("Medicine names must be unique, ignoring case and surrounding spaces.")
+        with transaction.atomic():
+            self.stock.all().delete()
+            PharmacyStock.objects.bulk_create([
+                PharmacyStock(pharmacy=self, medicine=name.strip(), quantity=item['quantity'], price=item['price'])
+                for name, item in (medicines or {}).items()
+            ])
+            # bulk_create sends no post_save, so refresh the catalogue here
+            catalogue.invalidate_medicine_catalogue()
+
     def __str__(self):
         return f"Pharmacy {self.pharmacy_id}"
 
+class PharmacyStock(models.Model):
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='stock')
+    medicine = models.CharField(max_length=100)
+    quantity = models.PositiveIntegerField(default=0)
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+
+    class Meta:
+        ordering = ['medicine']
+        constraints = [
+            models.UniqueConstraint(F('pharmacy'), Lower('medicine'), name='pharmacystock_pharmacy_medicine_ci_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine} x{self.quantity} ({self.pharmacy.pharmacy_id})"
+
 #Medical Records
 class MedicalRecord(models.Model):
     record_id = models.CharField(max_length=15, unique=True)
@@ -435,6 +536,17 @@ class MedicalRecord(models.Model):
     status = models.CharField(max_length=20, default='pending')
     dispensed_items = models.JSONField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Newest-first keyset pagination of the admin record list
+            models.Index(fields=['created_at', 'id'], name='medrec_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.record_id:
+            self.record_id = ids.next_record_id()
+        super().save(*args, **kwargs)
+
     # Overloaded update_record methods using multipledispatch
     @dispatch(str)
     def update_record(self, diagnosis):
@@ -522,4 +634,73 @@ class WardRoom(models.Model):
         return self.availability
 
     def __str__(self):
-        return f"Room {self.room_id} ({self.type}) - {'Available' if self.availability else 'Occupied'}"
\ No newline at end of file
+        return f"Room {self.room_id} ({self.type}) - {'Available' if self.availability else 'Occupied'}"
+
+# ID sequences
+class IdSequence(models.Model):
+    """Next free value of a named ID sequence; hospital.ids reserves values from it in blocks."""
+    name = models.CharField(max_length=20, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+# Email outbox
+class OutgoingEmail(models.Model):
+    """A queued email; hospital.outbox sends pending rows in batches and retries failures with backoff."""
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set while a worker holds the row, so two workers never send the same email
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
+# Patient search
+class PatientSearchDocument(models.Model):
+    """The text a patient is found by, precomputed by hospital.search and indexed for full-text queries."""
+    patient = models.OneToOneField(Patient, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='search_document')
+    # Copies of Patient.assignedDoctorId and Patient.status, so a doctor's search never joins Patient
+    doctor_user_id = models.PositiveIntegerField(null=True)
+    active = models.BooleanField(default=False)
+    name = models.TextField(blank=True)
+    contact = models.TextField(blank=True)
+    symptoms = models.TextField(blank=True)
+    diagnoses = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor_user_id', 'active'], name='patsearch_doctor_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,139 @@
+# hospital/outbox.py
+import logging
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'HOSPITAL_OUTBOX_BATCH_SIZE', 50)
+MAX_ATTEMPTS = getattr(settings, 'HOSPITAL_OUTBOX_MAX_ATTEMPTS', 5)
+# Seconds before the first retry, doubled after every further failure
+RETRY_DELAY = getattr(settings, 'HOSPITAL_OUTBOX_RETRY_DELAY', 60)
+# Seconds after which a claimed row is considered abandoned by a worker that died
+CLAIM_TIMEOUT = getattr(settings, 'HOSPITAL_OUTBOX_CLAIM_TIMEOUT', 600)
+
+
+def _model():
+    return apps.get_model('hospital', 'OutgoingEmail')
+
+
+def enqueue(subject, body, from_email, recipients):
+    """Queue an email for the outbox worker; returns immediately without touching SMTP."""
+    return _model().objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim(batch_size=BATCH_SIZE):
+    """Take up to batch_size due emails for this worker."""
+    OutgoingEmail = _model()
+    now = timezone.now()
+    OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING, claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT),
+    ).update(status=OutgoingEmail.PENDING, claimed_by='')
+
+    due = list(
+        OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    token = uuid.uuid4().hex
+    # Only rows still pending are taken, so racing workers split a batch instead of sharing it
+    OutgoingEmail.objects.filter(id__in=due, status=OutgoingEmail.PENDING).update(
+        status=OutgoingEmail.SENDING, claimed_by=token, claimed_at=now,
+    )
+    return list(OutgoingEmail.objects.filter(claimed_by=token, status=OutgoingEmail.SENDING))
+
+
+def _hold(email):
+    """
+    Renew this worker's claim on an email just before sending it.
+
+    Returns False when the claim ran out and another worker took the email
+    over. Rows later in a batch wait for the earlier ones, and a batch of
+    slow SMTP exchanges can outlast CLAIM_TIMEOUT.
+    """
+    return _model().objects.filter(
+        pk=email.pk, status=email.SENDING, claimed_by=email.claimed_by,
+    ).update(claimed_at=timezone.now()) == 1
+
+
+def _release(email, **fields):
+    # Only while this worker still holds the claim, so a takeover is never overwritten
+    released = _model().objects.filter(
+        pk=email.pk, status=email.SENDING, claimed_by=email.claimed_by,
+    ).update(claimed_by='', **fields)
+    if not released:
+        logger.warning("Outbox email %s was taken over by another worker while it was sent", email.pk)
+    return released
+
+
+def _mark_sent(email):
+    _release(email, status=email.SENT, attempts=email.attempts + 1, sent_at=timezone.now(), last_error='')
+
+
+def _mark_failed(email, error):
+    """Schedule a retry with exponential backoff, or give up after MAX_ATTEMPTS; returns True on retry."""
+    attempts = email.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        _release(email, status=email.FAILED, attempts=attempts, last_error=str(error))
+        return False
+    _release(email, status=email.PENDING, attempts=attempts, last_error=str(error),
+             next_attempt_at=timezone.now() + retry_delay(attempts))
+    return True
+
+
+def send_batch(batch_size=BATCH_SIZE):
+    """
+    Send one batch of due emails over a single mail connection.
+
+    Returns (sent, retried, failed). The connection is opened once and reused;
+    after an error it is reopened, since the SMTP session may be unusable.
+    Each email's claim is renewed right before it is sent, and emails another
+    worker took over in the meantime are skipped.
+    """
+    emails = claim(batch_size)
+    sent = retried = failed = 0
+    if not emails:
+        return sent, retried, failed
+
+    connection = get_connection()
+    is_open = False
+    try:
+        for email in emails:
+            if not _hold(email):
+                continue
+            try:
+                if not is_open:
+                    # An explicitly opened connection stays open across send_messages() calls
+                    connection.open()
+                    is_open = True
+                message = EmailMessage(email.subject, email.body, email.from_email, email.recipients)
+                connection.send_messages([message])
+            except Exception as e:
+                logger.warning("Sending outbox email %s failed (attempt %s): %s", email.pk, email.attempts + 1, e)
+                if _mark_failed(email, e):
+                    retried += 1
+                else:
+                    failed += 1
+                connection.close()
+                is_open = False
+            else:
+                _mark_sent(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, retried, failed
@@ -0,0 +1,93 @@
+# hospital/replicas.py
+import contextvars
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Alias of the read replica in DATABASES; reads stay on the primary when it is not configured
+REPLICA_ALIAS = getattr(settings, 'HOSPITAL_READ_REPLICA', 'replica')
+# Seconds a user's reads stay on the primary after one of their requests wrote
+PIN_SECONDS = getattr(settings, 'HOSPITAL_REPLICA_PIN_SECONDS', 5)
+PIN_SESSION_KEY = '_hospital_primary_until'
+
+# Set while a read_only_view runs, or while a request is tracking its writes
+_read_alias = contextvars.ContextVar('hospital_read_alias', default=None)
+_writes = contextvars.ContextVar('hospital_request_writes', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def reading_from_replica():
+    """Whether reads of the current view are being served by the replica."""
+    return _read_alias.get() is not None
+
+
+def is_pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def pin_to_primary(request):
+    request.session[PIN_SESSION_KEY] = time.time() + PIN_SECONDS
+
+
+def read_only_view(view):
+    """
+    Serve a view's reads from the read replica.
+
+    Only GET/HEAD requests are routed, and only while the user is not pinned
+    to the primary by a recent write of their own, so they always see what
+    they just saved.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not replica_configured() or is_pinned(request):
+            return view(request, *args, **kwargs)
+        token = _read_alias.set(REPLICA_ALIAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+def track_writes():
+    """Start recording whether the current request writes; returns (token, recorder)."""
+    recorder = {'wrote': False}
+    return _writes.set(recorder), recorder
+
+
+def stop_tracking(token):
+    _writes.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads inside read_only_view to the replica and everything else to the primary.
+
+    A replica is a copy of the primary, so migrations only run on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        # Reads inside a transaction must see that transaction's writes
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        recorder = _writes.get()
+        if recorder is not None:
+            recorder['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
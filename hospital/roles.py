@@ -0,0 +1,54 @@
+# hospital/roles.py
+from django.conf import settings
+from django.core.cache import cache
+
+from . import caching
+
+ADMIN = 'ADMIN'
+DOCTOR = 'DOCTOR'
+PATIENT = 'PATIENT'
+PHARMACIST = 'PHARMACIST'
+
+# Order matters: afterlogin_view checks admin, then doctor, then patient
+ROLE_PRECEDENCE = (ADMIN, DOCTOR, PATIENT, PHARMACIST)
+
+# Seconds a user's role group names stay cached
+ROLE_CACHE_TIMEOUT = getattr(settings, 'HOSPITAL_ROLE_CACHE_TIMEOUT', 300)
+
+
+def _cache_key(user_id):
+    return f"hospital:roles:{user_id}"
+
+
+def get_roles(user):
+    """Return the set of hospital roles (group names) the user belongs to."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_hospital_roles', None)
+    if roles is None:
+        key = _cache_key(user.pk)
+        names = caching.get(key, 'roles')
+        if names is None:
+            names = tuple(user.groups.filter(name__in=ROLE_PRECEDENCE).values_list('name', flat=True))
+            cache.set(key, names, caching.shared_timeout(ROLE_CACHE_TIMEOUT))
+        roles = frozenset(names)
+        # Memoize on the user object so repeated checks in one request are free
+        user._hospital_roles = roles
+    return roles
+
+
+def get_role(user):
+    """Return the user's primary role, or None for users without a hospital role."""
+    roles = get_roles(user)
+    for role in ROLE_PRECEDENCE:
+        if role in roles:
+            return role
+    return None
+
+
+def has_role(user, role):
+    return role in get_roles(user)
+
+
+def invalidate_roles(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
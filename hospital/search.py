@@ -0,0 +1,192 @@
+# hospital/search.py
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+# How many of a patient's newest diagnoses are searchable
+RECENT_DIAGNOSES = getattr(settings, 'HOSPITAL_SEARCH_RECENT_DIAGNOSES', 5)
+# Most results a search returns, best ranked first
+RESULT_LIMIT = getattr(settings, 'HOSPITAL_SEARCH_RESULT_LIMIT', 50)
+# Calling code of the local numbering plan: "+20 101..." is also indexed as "0101..."
+COUNTRY_CODE = getattr(settings, 'HOSPITAL_SEARCH_COUNTRY_CODE', '20')
+# Only the first few words of a query are used
+MAX_TERMS = 8
+BATCH_SIZE = 1000
+
+DOCUMENT_TABLE = 'hospital_patientsearchdocument'
+# SQLite: contentless FTS5 table kept in sync with the document table by triggers (migration 0040).
+# Its scope column holds "doctor<user id><status>" and the bare status, so a doctor's search
+# only ever ranks that doctor's patients.
+FTS_TABLE = 'hospital_patientsearch_fts'
+# Column weights for bm25(): a name match outranks contact details, then symptoms, then diagnoses
+FTS_WEIGHTS = '0.0, 10.0, 5.0, 2.0, 1.0'
+# PostgreSQL: must stay identical to the GIN expression index of migration 0040, or it is not used
+TSVECTOR = (
+    "setweight(to_tsvector('simple', d.name), 'A') || "
+    "setweight(to_tsvector('simple', d.contact), 'B') || "
+    "setweight(to_tsvector('simple', d.symptoms), 'C') || "
+    "setweight(to_tsvector('simple', d.diagnoses), 'D')"
+)
+
+# Letters and digits only, which is how both full-text indexes split words
+_TERM = re.compile(r'[^\W_]+')
+
+
+def _model(name):
+    return apps.get_model('hospital', name)
+
+
+def terms(query):
+    return [term.lower() for term in _TERM.findall(query or '')][:MAX_TERMS]
+
+
+def phone_forms(mobile):
+    """
+    A mobile number as typed, as digits only and, when it is international
+    with the local calling code, in its national form with a leading 0.
+    """
+    mobile = (mobile or '').strip()
+    digits = re.sub(r'\D', '', mobile)
+    forms = [mobile, digits]
+    international = digits[2:] if mobile.startswith('00') else digits if mobile.startswith('+') else ''
+    if COUNTRY_CODE and international.startswith(COUNTRY_CODE):
+        forms.append('0' + international[len(COUNTRY_CODE):])
+    return list(dict.fromkeys(form for form in forms if form))
+
+
+def document_fields(patient, diagnoses):
+    """The searchable text of a patient, given its newest diagnoses."""
+    emails = {email for email in (patient.email, patient.user.email) if email}
+    return {
+        'doctor_user_id': patient.assignedDoctorId,
+        'active': patient.status,
+        'name': f"{patient.user.first_name} {patient.user.last_name}".strip(),
+        # "+20 101 234 5678" is found by "2010123", and by "0101234" through its national form
+        'contact': ' '.join([*phone_forms(patient.mobile), *sorted(emails)]),
+        'symptoms': patient.symptoms or '',
+        'diagnoses': '\n'.join(diagnoses),
+    }
+
+
+def _recent_diagnoses(patient_ids):
+    recent = {}
+    rows = (
+        _model('MedicalRecord').objects.filter(patient_id__in=patient_ids)
+        .order_by('patient_id', '-created_at', '-id').values_list('patient_id', 'diagnosis')
+    )
+    for patient_id, diagnosis in rows.iterator():
+        diagnoses = recent.setdefault(patient_id, [])
+        if len(diagnoses) < RECENT_DIAGNOSES:
+            diagnoses.append(diagnosis)
+    return recent
+
+
+def _documents(patients):
+    diagnoses = _recent_diagnoses([patient.pk for patient in patients])
+    Document = _model('PatientSearchDocument')
+    return [Document(patient_id=patient.pk, **document_fields(patient, diagnoses.get(patient.pk, [])))
+            for patient in patients]
+
+
+def refresh(*patient_ids):
+    """Rewrite the search documents of the given patients, e.g. after one of them changed."""
+    Patient = _model('Patient')
+    Document = _model('PatientSearchDocument')
+    patients = list(Patient.objects.filter(pk__in=patient_ids).select_related('user'))
+    if not patients:
+        return
+    documents = _documents(patients)
+    with transaction.atomic():
+        existing = set(Document.objects.filter(pk__in=[doc.pk for doc in documents]).values_list('pk', flat=True))
+        Document.objects.bulk_create([doc for doc in documents if doc.pk not in existing])
+        changed = [doc for doc in documents if doc.pk in existing]
+        if changed:
+            Document.objects.bulk_update(
+                changed, ['doctor_user_id', 'active', 'name', 'contact', 'symptoms', 'diagnoses'])
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Recompute every search document, one batch of patients per transaction; returns the count."""
+    Patient = _model('Patient')
+    Document = _model('PatientSearchDocument')
+    Document.objects.all().delete()
+    last_pk, total = 0, 0
+    while True:
+        patients = list(Patient.objects.filter(pk__gt=last_pk).order_by('pk').select_related('user')[:batch_size])
+        if not patients:
+            return total
+        with transaction.atomic():
+            Document.objects.bulk_create(_documents(patients))
+        total += len(patients)
+        last_pk = patients[-1].pk
+
+
+def search_patients(query, doctor_user_id=None, active=True, limit=RESULT_LIMIT):
+    """
+    Ids of the patients matching every word of ``query``, best match first.
+
+    Each word also matches as a prefix, so results follow a query as it is
+    typed. ``doctor_user_id`` narrows the search to one doctor's patients
+    and ``active`` to admitted (True) or pending (False) ones; None for either
+    searches them all.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    if connection.vendor == 'sqlite':
+        sql = (f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+               f"ORDER BY bm25({FTS_TABLE}, {FTS_WEIGHTS}), rowid LIMIT %s")
+        params = [_fts_match(words, doctor_user_id, active), limit]
+    elif connection.vendor == 'postgresql':
+        filters, params = [], []
+        if doctor_user_id is not None:
+            filters.append('d.doctor_user_id = %s')
+            params.append(doctor_user_id)
+        if active is not None:
+            filters.append('d.active = %s')
+            params.append(active)
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        sql = (
+            f"SELECT d.patient_id FROM {DOCUMENT_TABLE} d "
+            f"WHERE {' AND '.join([f'({TSVECTOR}) @@ to_tsquery(%s, %s)', *filters])} "
+            f"ORDER BY ts_rank({TSVECTOR}, to_tsquery(%s, %s)) DESC, d.patient_id LIMIT %s"
+        )
+        params = ['simple', tsquery, *params, 'simple', tsquery, limit]
+    else:
+        return _search_unindexed(words, doctor_user_id, active, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fts_match(words, doctor_user_id, active):
+    # Every word as a prefix, in any column but scope
+    phrases = ' '.join(f'"{word}"*' for word in words)
+    match = f"- {{scope}}: ({phrases})"
+    if doctor_user_id is not None:
+        statuses = ['active', 'inactive'] if active is None else ['active' if active else 'inactive']
+        scopes = ' OR '.join(f'doctor{int(doctor_user_id)}{status}' for status in statuses)
+        return f"{{scope}}: ({scopes}) AND {match}"
+    if active is None:
+        return match
+    # Inactive patients are the few, so excluding them beats intersecting with every active one
+    return f"{match} NOT {{scope}}: inactive" if active else f"{{scope}}: inactive AND {match}"
+
+
+def _search_unindexed(words, doctor_user_id, active, limit):
+    """Backends without a full-text index: substring match on the documents, unranked."""
+    documents = _model('PatientSearchDocument').objects.all()
+    if doctor_user_id is not None:
+        documents = documents.filter(doctor_user_id=doctor_user_id)
+    if active is not None:
+        documents = documents.filter(active=active)
+    for word in words:
+        documents = documents.filter(
+            Q(name__icontains=word) | Q(contact__icontains=word)
+            | Q(symptoms__icontains=word) | Q(diagnoses__icontains=word)
+        )
+    return list(documents.order_by('name', 'pk').values_list('patient_id', flat=True)[:limit])
@@ -0,0 +1,278 @@
+# hospital/seeding.py
+import random
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, catalogue, dashboard, ids, models, roles, search
+
+SEED_PASSWORD = 'hospital-seed'
+BATCH_SIZE = 1000
+
+FIRST_NAMES = ['Ahmed', 'Mona', 'Omar', 'Sara', 'Youssef', 'Nour', 'Karim', 'Laila', 'Hassan', 'Mariam',
+               'Ali', 'Salma', 'Tarek', 'Hana', 'Mostafa', 'Farida', 'Khaled', 'Yasmin', 'Amr', 'Dina']
+LAST_NAMES = ['Hassan', 'Mahmoud', 'Ibrahim', 'Saleh', 'Fathy', 'Nabil', 'Tantawi', 'Kamal', 'Adel', 'Samir',
+              'Farouk', 'Zaki', 'Soliman', 'Gamal', 'Mansour', 'Younis', 'Rashad', 'Said', 'Lotfy', 'Shawky']
+SYMPTOMS = ['Fever', 'Chest pain', 'Headache', 'Skin rash', 'Cough', 'Back pain', 'Allergy', 'Fatigue',
+            'Shortness of breath', 'Abdominal pain']
+DIAGNOSES = ['Influenza', 'Hypertension', 'Migraine', 'Dermatitis', 'Bronchitis', 'Lumbar strain',
+             'Seasonal allergy', 'Anemia', 'Asthma', 'Gastritis']
+MEDICINES = ['Paracetamol', 'Ibuprofen', 'Amoxicillin', 'Cetirizine', 'Omeprazole', 'Metformin',
+             'Salbutamol', 'Loratadine', 'Azithromycin', 'Atorvastatin', 'Diclofenac', 'Ferrous Sulfate']
+APPOINTMENT_STATUSES = ['Pending', 'Approved', 'Approved', 'Completed', 'Cancelled']
+
+# Only these columns are kept in memory once a batch is inserted, so half a million
+# patients cost a few tuples instead of model instances
+Person = namedtuple('Person', 'pk user_id first_name last_name doctor_user_id')
+
+
+class HospitalSeeder:
+    """
+    Creates a referentially consistent synthetic hospital with bulk inserts.
+
+    Users share one pre-hashed password (SEED_PASSWORD by default) and every
+    random choice comes from ``seed``, so two runs with the same arguments
+    produce the same data. Usernames and codes start with ``prefix``.
+
+    Rows are generated and inserted one batch at a time, each batch in its
+    own transaction, so memory stays flat however many appointments or
+    records are asked for. ``progress(label, done, total)`` is called after
+    every batch.
+    """
+
+    def __init__(self, doctors=20, patients=200, appointments=1000, records=500, pharmacies=3,
+                 medicines=30, wards=30, discharged=20, seed=0, prefix='seed', batch_size=BATCH_SIZE,
+                 password=SEED_PASSWORD, progress=None):
+        self.counts = {
+            'doctors': doctors, 'patients': patients, 'appointments': appointments, 'records': records,
+            'pharmacies': pharmacies, 'medicines': medicines, 'wards': wards, 'discharged': discharged,
+        }
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.password = make_password(password)
+        self.progress = progress
+        self.now = timezone.now()
+
+    def run(self):
+        groups = {name: Group.objects.get_or_create(name=name)[0] for name in (roles.ADMIN, roles.DOCTOR, roles.PATIENT)}
+        self._create_people('admin', 1, groups[roles.ADMIN], is_staff=True)
+        self.doctors = self._create_people('doctor', self.counts['doctors'], groups[roles.DOCTOR],
+                                           (models.Doctor, self._doctor))
+        self.doctor_pks = {doctor.user_id: doctor.pk for doctor in self.doctors}
+        self.patients = self._create_people('patient', self.counts['patients'], groups[roles.PATIENT],
+                                            (models.Patient, self._patient))
+        self.medicines = self._medicine_names()
+        self._create_pharmacies()
+        self._create_wards()
+        self._create_appointments()
+        self._create_records()
+        self._create_discharges()
+        # bulk_create sends no signals, so drop what the model signals would have invalidated
+        dashboard.invalidate_admin_counts()
+        catalogue.invalidate_medicine_catalogue()
+        caching.bump('doctors', 'departments')
+        search.rebuild(self.batch_size)
+        return dict(self.counts)
+
+    def _batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _report(self, label, done, total):
+        if self.progress is not None:
+            self.progress(label, done, total)
+
+    def _insert(self, model, rows, label=None, total=None):
+        """bulk_create a stream of unsaved rows in batches, each in its own transaction."""
+        done = 0
+        for batch in self._batches(rows):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            done += len(batch)
+            if label:
+                self._report(label, done, total)
+
+    def _create_people(self, role, count, group, profile=None, is_staff=False):
+        """
+        Create users with their group membership and, given ``profile`` as
+        (model, build(i, user)), their profile row, one batch at a time.
+
+        Returns a Person per profile; bulk_create fills in primary keys on
+        SQLite and PostgreSQL, which the profiles and later tables rely on.
+        """
+        people = []
+        users = (
+            User(
+                username=f"{self.prefix}_{role}_{i}",
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                email=f"{self.prefix}_{role}_{i}@example.com",
+                password=self.password,
+                is_staff=is_staff,
+            ) for i in range(count)
+        )
+        done = 0
+        for batch in self._batches(users):
+            with transaction.atomic():
+                created = User.objects.bulk_create(batch)
+                User.groups.through.objects.bulk_create(
+                    User.groups.through(user_id=user.pk, group_id=group.pk) for user in created)
+                if profile is not None:
+                    model, build = profile
+                    rows = model.objects.bulk_create([build(done + i, user) for i, user in enumerate(created)])
+                    for user, row in zip(created, rows):
+                        people.append(Person(row.pk, user.pk, user.first_name, user.last_name,
+                                             getattr(row, 'assignedDoctorId', None)))
+            done += len(batch)
+            self._report(f"{role}s", done, count)
+        return people
+
+    def _doctor(self, i, user):
+        return models.Doctor(
+            user=user,
+            profile_pic='profile_pic/DoctorProfilePic/seed.png',
+            address=f"{i} Clinic Street",
+            mobile=f"010{i:08d}",
+            department=self.random.choice(models.departments)[0],
+            status=True,
+        )
+
+    def _patient(self, i, user):
+        return models.Patient(
+            user=user,
+            profile_pic='profile_pic/PatientProfilePic/seed.png',
+            address=f"{i} Nile Street",
+            mobile=f"011{i:08d}",
+            email=user.email,
+            symptoms=self.random.choice(SYMPTOMS),
+            assignedDoctorId=self.random.choice(self.doctors).user_id,
+            status=True,
+            age=self.random.randint(1, 95),
+            gender=self.random.choice(['Male', 'Female']),
+        )
+
+    def _medicine_names(self):
+        count = self.counts['medicines']
+        names = MEDICINES[:count]
+        # Larger catalogues get strength variants of the base names
+        names += [f"{MEDICINES[i % len(MEDICINES)]} {100 + i}mg" for i in range(count - len(names))]
+        return names
+
+    def _create_pharmacies(self):
+        pharmacies = models.Pharmacy.objects.bulk_create(
+            models.Pharmacy(pharmacy_id=f"{self.prefix[:3].upper()}P{i:05d}")
+            for i in range(self.counts['pharmacies'])
+        )
+        self._insert(models.PharmacyStock, (
+            models.PharmacyStock(
+                pharmacy=pharmacy,
+                medicine=name,
+                quantity=self.random.randint(1000, 100000),
+                price=Decimal(self.random.randint(100, 10000)) / 100,
+            ) for pharmacy in pharmacies for name in self.medicines
+        ), 'pharmacy stock', self.counts['pharmacies'] * len(self.medicines))
+
+    def _create_wards(self):
+        # Every other ward is occupied by a patient, starting with the first patients
+        occupants = iter(self.patients)
+
+        def wards():
+            for i in range(self.counts['wards']):
+                occupant = next(occupants, None) if i % 2 == 0 else None
+                yield models.WardRoom(
+                    room_id=f"{self.prefix[:3].upper()}W{i:05d}",
+                    type=self.random.choice(['ICU', 'General', 'Private']),
+                    availability=occupant is None,
+                    assigned_patient_id=occupant.pk if occupant else None,
+                    ward=f"Ward {i // 10 + 1}",
+                )
+        self._insert(models.WardRoom, wards(), 'wards', self.counts['wards'])
+
+    def _create_appointments(self):
+        doctors = {doctor.user_id: doctor for doctor in self.doctors}
+
+        def appointments():
+            for _ in range(self.counts['appointments']):
+                patient = self.random.choice(self.patients)
+                doctor = doctors[patient.doctor_user_id] if self.random.random() < 0.8 else self.random.choice(self.doctors)
+                yield models.Appointment(
+                    patientId=patient.user_id,
+                    doctorId=doctor.user_id,
+                    patientName=patient.first_name,
+                    doctorName=doctor.first_name,
+                    patient_id=patient.pk,
+                    doctor_id=doctor.pk,
+                    appointmentDate=self.now + timedelta(days=self.random.randint(-60, 60), hours=self.random.randint(8, 17)),
+                    description=self.random.choice(SYMPTOMS),
+                    status=self.random.choice(APPOINTMENT_STATUSES),
+                )
+        self._insert(models.Appointment, appointments(), 'appointments', self.counts['appointments'])
+
+    def _create_records(self):
+        def records():
+            for start in range(0, self.counts['records'], self.batch_size):
+                # One sequence UPDATE per batch instead of one per ID block
+                for record_id in ids.record_ids.reserve_ids(min(self.batch_size, self.counts['records'] - start)):
+                    patient = self.random.choice(self.patients)
+                    medicines = self.random.sample(self.medicines, k=min(len(self.medicines), self.random.randint(1, 3)))
+                    yield models.MedicalRecord(
+                        record_id=record_id,
+                        patient_id=patient.pk,
+                        doctor_id=self.doctor_pks[patient.doctor_user_id],
+                        diagnosis=self.random.choice(DIAGNOSES),
+                        prescribed_treatment=", ".join(medicines),
+                        treatment_quantities=", ".join(f"{name}: {self.random.randint(1, 3)}" for name in medicines),
+                        created_at=self.now - timedelta(minutes=self.random.randint(0, 365 * 24 * 60)),
+                        status='pending' if self.random.random() < 0.7 else 'dispensed',
+                    )
+        self._insert(models.MedicalRecord, records(), 'medical records', self.counts['records'])
+
+    def _create_discharges(self):
+        # The last patients are the discharged ones, so they never overlap the ward occupants
+        discharged = self.patients[len(self.patients) - min(self.counts['discharged'], len(self.patients)):]
+        doctors = {doctor.user_id: doctor for doctor in self.doctors}
+        details = models.Patient.objects.in_bulk([patient.pk for patient in discharged])
+        bill_ids = ids.bill_ids.reserve_ids(len(discharged)) if discharged else []
+        today = self.now.date()
+        discharges, bills = [], []
+        for patient, bill_id in zip(discharged, bill_ids):
+            days = self.random.randint(1, 14)
+            room, fee, medicine, other = days * 300, self.random.randint(200, 1000), self.random.randint(0, 500), self.random.randint(0, 200)
+            discharges.append(models.PatientDischargeDetails(
+                patientId=patient.pk,
+                patientName=patient.first_name + " " + patient.last_name,
+                assignedDoctorName=doctors[patient.doctor_user_id].first_name,
+                address=details[patient.pk].address,
+                mobile=details[patient.pk].mobile,
+                symptoms=details[patient.pk].symptoms,
+                admitDate=today - timedelta(days=days),
+                releaseDate=today,
+                daySpent=days,
+                roomCharge=room,
+                medicineCost=medicine,
+                doctorFee=fee,
+                OtherCharge=other,
+                total=room + medicine + fee + other,
+            ))
+            bills.append(models.Billing(
+                bill_id=bill_id,
+                patient_id=patient.pk,
+                treatment_cost=fee + other,
+                medicine_cost=medicine,
+                total_amount=room + medicine + fee + other,
+                payment_status=self.random.choice(['Pending', 'Paid', 'Partial']),
+            ))
+        self._insert(models.PatientDischargeDetails, iter(discharges), 'discharges', len(discharges))
+        self._insert(models.Billing, iter(bills))
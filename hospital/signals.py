@@ -0,0 +1,188 @@
+# hospital/signals.py
+from django.contrib.auth import user_logged_in
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, catalogue, dashboard, invoices, models, roles, search, sqlite_tuning
+
+
+# Role cache invalidation
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            roles.invalidate_roles(instance.pk)
+        return
+    # group.user_set.add/remove/clear(...)
+    if action == 'pre_clear':
+        instance._hospital_role_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        roles.invalidate_roles(*getattr(instance, '_hospital_role_user_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        roles.invalidate_roles(*pk_set)
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_delete(sender, instance, **kwargs):
+    roles.invalidate_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_roles_on_user_delete(sender, instance, **kwargs):
+    roles.invalidate_roles(instance.pk)
+
+
+@receiver(user_logged_in)
+def resolve_roles_on_login(sender, request, user, **kwargs):
+    # Start every session from the database, then serve role checks from cache
+    roles.invalidate_roles(user.pk)
+    user.__dict__.pop('_hospital_roles', None)
+    request.hospital_role = roles.get_role(user)
+
+
+# Admin dashboard counters
+@receiver(post_save, sender=models.Doctor)
+@receiver(post_delete, sender=models.Doctor)
+@receiver(post_save, sender=models.Patient)
+@receiver(post_delete, sender=models.Patient)
+@receiver(post_save, sender=models.Appointment)
+@receiver(post_delete, sender=models.Appointment)
+@receiver(post_save, sender=models.Department)
+@receiver(post_delete, sender=models.Department)
+@receiver(post_save, sender=models.WardRoom)
+@receiver(post_delete, sender=models.WardRoom)
+def invalidate_admin_dashboard(sender, **kwargs):
+    dashboard.invalidate_admin_counts()
+
+
+# Doctor dashboard counters. A reassignment changes the counters of the previous doctor
+# too, so the doctor before the save is remembered.
+@receiver(pre_save, sender=models.Patient)
+def remember_previous_patient_doctor(sender, instance, **kwargs):
+    if instance.pk:
+        instance._hospital_previous_doctor = models.Patient.objects.filter(
+            pk=instance.pk).values_list('assignedDoctorId', flat=True).first()
+
+
+@receiver(post_save, sender=models.Patient)
+@receiver(post_delete, sender=models.Patient)
+def invalidate_doctor_dashboard_for_patient(sender, instance, **kwargs):
+    dashboard.invalidate_doctor_counts(instance.assignedDoctorId, getattr(instance, '_hospital_previous_doctor', None))
+
+
+@receiver(pre_save, sender=models.Appointment)
+def remember_previous_appointment_doctor(sender, instance, **kwargs):
+    # Appointment keeps the ids it was loaded with, so this costs no query
+    loaded = getattr(instance, '_loaded_relations', None)
+    instance._hospital_previous_doctor = loaded['doctorId'] if loaded else None
+
+
+@receiver(post_save, sender=models.Appointment)
+@receiver(post_delete, sender=models.Appointment)
+def invalidate_doctor_dashboard_for_appointment(sender, instance, **kwargs):
+    dashboard.invalidate_doctor_counts(instance.doctorId, getattr(instance, '_hospital_previous_doctor', None))
+
+
+@receiver(post_save, sender=models.MedicalRecord)
+@receiver(post_delete, sender=models.MedicalRecord)
+def invalidate_doctor_dashboard_for_record(sender, instance, **kwargs):
+    if instance.doctor_id:
+        dashboard.invalidate_doctor_counts(instance.doctor.user_id)
+
+
+@receiver(post_save, sender=models.PatientDischargeDetails)
+@receiver(post_delete, sender=models.PatientDischargeDetails)
+def invalidate_doctor_dashboard_for_discharge(sender, instance, **kwargs):
+    # The discharged patient's doctor, by id. Discharges only store the doctor's first name
+    # and the counter counts them by it, so doctors sharing that name are invalidated as well.
+    doctor_user_id = models.Patient.objects.filter(pk=instance.patientId).values_list(
+        'assignedDoctorId', flat=True).first()
+    namesakes = models.Doctor.objects.filter(user__first_name=instance.assignedDoctorName).values_list(
+        'user_id', flat=True)
+    dashboard.invalidate_doctor_counts(doctor_user_id, *namesakes)
+
+
+# Prescription medicine catalogue
+@receiver(post_save, sender=models.PharmacyStock)
+@receiver(post_delete, sender=models.PharmacyStock)
+@receiver(post_delete, sender=models.Pharmacy)
+def invalidate_medicine_catalogue(sender, created=True, **kwargs):
+    # Quantity/price edits keep the same names, only new or removed rows change the catalogue
+    if created:
+        catalogue.invalidate_medicine_catalogue()
+
+
+# Invoice artefacts
+@receiver(post_save, sender=models.Billing)
+def prerender_invoice_for_bill(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invoices.prerender_patient_invoice(instance.patient_id))
+
+
+@receiver(post_save, sender=models.PatientDischargeDetails)
+def prerender_invoice_for_discharge(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invoices.prerender_patient_invoice(instance.patientId))
+
+
+# Fragment cache generations: the doctor lists show doctors, and the department lists
+# show each department's head doctor
+@receiver(post_save, sender=models.Doctor)
+@receiver(post_delete, sender=models.Doctor)
+def bump_doctor_generation(sender, instance, **kwargs):
+    caching.bump('doctors', 'departments')
+
+
+@receiver(post_save, sender=models.Department)
+@receiver(post_delete, sender=models.Department)
+def bump_department_generation(sender, instance, **kwargs):
+    caching.bump('departments')
+
+
+# The department lists also count each department's doctors
+@receiver(m2m_changed, sender=models.Department.doctors_list.through)
+def bump_department_generation_on_doctors_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        caching.bump('departments')
+
+
+# Patient search documents. Refreshed after commit: a record deleted along with its
+# patient must not write the patient's document back.
+SEARCHABLE_USER_FIELDS = {'first_name', 'last_name', 'email'}
+SEARCHABLE_RECORD_FIELDS = {'patient', 'diagnosis', 'created_at'}
+
+
+def _refresh_search(*patient_ids):
+    transaction.on_commit(lambda: search.refresh(*patient_ids))
+
+
+@receiver(post_save, sender=models.Patient)
+def refresh_search_for_patient(sender, instance, **kwargs):
+    _refresh_search(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def refresh_search_for_user(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login only
+    if created or (update_fields is not None and not SEARCHABLE_USER_FIELDS & set(update_fields)):
+        return
+    patient_ids = list(models.Patient.objects.filter(user_id=instance.pk).values_list('pk', flat=True))
+    if patient_ids:
+        _refresh_search(*patient_ids)
+
+
+@receiver(post_save, sender=models.MedicalRecord)
+@receiver(post_delete, sender=models.MedicalRecord)
+def refresh_search_for_record(sender, instance, update_fields=None, **kwargs):
+    # Dispensing only changes the status
+    if update_fields is not None and not SEARCHABLE_RECORD_FIELDS & set(update_fields):
+        return
+    _refresh_search(instance.patient_id)
+
+
+# SQLite tuning profile
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    sqlite_tuning.configure_connection(connection)
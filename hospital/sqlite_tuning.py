@@ -0,0 +1,17 @@
+# hospital/sqlite_tuning.py
+from django.conf import settings
+
+
+def configure_connection(connection):
+    """
+    Apply HOSPITAL_SQLITE_PRAGMAS to a freshly opened SQLite connection.
+
+    Settings are read on every connection so a deployment (or a benchmark)
+    can switch profiles without restarting the process.
+    """
+    pragmas = getattr(settings, 'HOSPITAL_SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
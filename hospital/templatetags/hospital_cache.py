@@ -0,0 +1,42 @@
+from django import template
+
+from hospital import caching
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, generations, name, vary_on):
+        self.nodelist = nodelist
+        self.generations = generations
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        generations = self.generations.resolve(context).split(',')
+        return caching.fragment(
+            self.name.resolve(context),
+            generations,
+            [value.resolve(context) for value in self.vary_on],
+            lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag('cachedfragment')
+def do_cachedfragment(parser, token):
+    """
+    {% cachedfragment 'doctors,departments' 'fragment-name' [vary_on ...] %} ... {% endcachedfragment %}
+
+    Caches the enclosed block until one of the comma-separated generations is bumped.
+    """
+    nodelist = parser.parse(('endcachedfragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes the generations and a fragment name")
+    return FragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
@@ -1,12 +1,18 @@
 from django import template
-from hospital.models import WardRoom
+from hospital.models import Patient, WardRoom
 
 register = template.Library()
 
 @register.filter
 def get_ward_room(patient):
+    # Preloaded by loaders.with_ward_room() or select_related('assigned_room'): no query per row
+    if hasattr(patient, 'ward_room_id'):
+        return patient.ward_room_id or "Not Assigned"
+    if Patient.assigned_room.is_cached(patient):
+        room = getattr(patient, 'assigned_room', None)
+        return room.room_id if room else "Not Assigned"
     try:
         room = WardRoom.objects.get(assigned_patient=patient)
         return room.room_id
     except WardRoom.DoesNotExist:
-        return "Not Assigned"
\ No newline at end of file
+        return "Not Assigned"
@@ -1,15 +1,17 @@
 # hospital/views.py
 import json
 import io
-from io import BytesIO
 from django.utils import timezone
 from django.shortcuts import render, redirect, reverse, get_object_or_404
-from . import forms, models
+from . import caching, dashboard, directory, forms, identity, ids, instrumentation, invoices, keyset, loaders, models, outbox, roles, search
 from django.db.models import Sum
 from django.contrib.auth.models import Group
-from django.http import HttpResponseRedirect, HttpResponse, FileResponse
-from django.core.mail import send_mail
+from django.http import HttpResponseRedirect, HttpResponse, FileResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.contrib.auth.decorators import login_required, user_passes_test
+from .caching import cache_anonymous_page
+from .replicas import read_only_view
 from django.template.loader import get_template
 from datetime import datetime, timedelta, date
 from django.conf import settings
@@ -20,9 +22,9 @@ from .forms import MedicalRecordForm, DoctorMedicalRecordForm
 from .models import Patient, Doctor, MedicalRecord
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from decimal import Decimal, InvalidOperation
-from reportlab.pdfgen import canvas
 from xhtml2pdf import pisa
 
+@cache_anonymous_page
 def home_view(request):
     if request.user.is_authenticated:
         return HttpResponseRedirect('afterlogin')
@@ -84,27 +86,42 @@ def patient_signup_view(request):
 
 
 
+# Role checks read the cached role set from hospital.roles instead of querying auth_group
 def is_admin(user):
-    return user.groups.filter(name='ADMIN').exists()
+    return roles.has_role(user, roles.ADMIN)
 
 def is_doctor(user):
-    return user.groups.filter(name='DOCTOR').exists()
+    return roles.has_role(user, roles.DOCTOR)
 
 def is_patient(user):
-    return user.groups.filter(name='PATIENT').exists()
+    return roles.has_role(user, roles.PATIENT)
+
+
+# The logged-in user's profile, as IdentityMapMiddleware attached it. A user in several role
+# groups only gets the profile of the primary role there, so the other is looked up directly
+def current_doctor(request):
+    if getattr(request, 'hospital_role', None) == roles.DOCTOR:
+        return request.hospital_profile
+    return identity.doctor_for_user(request.user.id)
+
+def current_patient(request):
+    if getattr(request, 'hospital_role', None) == roles.PATIENT:
+        return request.hospital_profile
+    return identity.patient_for_user(request.user.id)
 
 
 
 def afterlogin_view(request):
-    if is_admin(request.user):
+    role = request.hospital_role
+    if role == roles.ADMIN:
         return redirect('admin-dashboard')
-    elif is_doctor(request.user):
+    elif role == roles.DOCTOR:
         accountapproval = models.Doctor.objects.all().filter(user_id=request.user.id, status=True)
         if accountapproval:
             return redirect('doctor-dashboard')
         else:
             return render(request, 'hospital/doctor_wait_for_approval.html')
-    elif is_patient(request.user):
+    elif role == roles.PATIENT:
         accountapproval = models.Patient.objects.all().filter(user_id=request.user.id, status=True)
         if accountapproval:
             return redirect('patient-dashboard')
@@ -115,37 +132,32 @@ def afterlogin_view(request):
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
 def admin_dashboard_view(request):
-    doctors = models.Doctor.objects.all().order_by('-id')
-    patients = models.Patient.objects.all().order_by('-id')
-    doctorcount = models.Doctor.objects.all().filter(status=True).count()
-    pendingdoctorcount = models.Doctor.objects.all().filter(status=False).count()
-    patientcount = models.Patient.objects.all().filter(status=True).count()
-    pendingpatientcount = models.Patient.objects.all().filter(status=False).count()
-    appointmentcount = models.Appointment.objects.all().filter(status='Approved').count()
-    pendingappointmentcount = models.Appointment.objects.all().filter(status='Pending').count()
-    
-    # Add department and room data
-    departmentcount = models.Department.objects.all().count()
-    activedepartmentcount = models.Department.objects.filter(head_of_department__isnull=False).count()
-    wardcount = models.WardRoom.objects.all().count()
-    occupiedwardcount = models.WardRoom.objects.filter(availability=False).count()
-    
     mydict = {
-        'doctors': doctors,
-        'patients': patients,
-        'doctorcount': doctorcount,
-        'pendingdoctorcount': pendingdoctorcount,
-        'patientcount': patientcount,
-        'pendingpatientcount': pendingpatientcount,
-        'appointmentcount': appointmentcount,
-        'pendingappointmentcount': pendingappointmentcount,
-        'departmentcount': departmentcount,
-        'activedepartmentcount': activedepartmentcount,
-        'wardcount': wardcount,
-        'occupiedwardcount': occupiedwardcount,
+        'doctors': dashboard.recent_doctors(),
+        'patients': dashboard.recent_patients(),
     }
+    # Counters come from one conditional aggregate per table, cached briefly
+    mydict.update(dashboard.get_admin_counts())
     return render(request, 'hospital/admin_dashboard.html', context=mydict)
 
+@login_required(login_url='adminlogin')
+@user_passes_test(is_admin)
+def admin_metrics_view(request):
+    # Rolling per-view percentiles collected by MetricsMiddleware in this worker
+    if request.method == 'POST':
+        instrumentation.store.clear()
+        caching.stats.clear()
+        messages.success(request, "Metrics window cleared.")
+        return redirect('admin-metrics')
+    rows = instrumentation.store.summary()
+    for row in rows:
+        row['budget'] = instrumentation.QUERY_BUDGETS.get(row['view'], instrumentation.DEFAULT_QUERY_BUDGET)
+    return render(request, 'hospital/admin_metrics.html', {
+        'rows': rows,
+        'window': instrumentation.store.window,
+        'cache_rows': caching.stats.summary(),
+    })
+
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
 def admin_doctor_view(request):
@@ -153,6 +165,7 @@ def admin_doctor_view(request):
 
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
+@read_only_view
 def admin_view_doctor_view(request):
     doctors = models.Doctor.objects.all().filter(status=True)
     return render(request, 'hospital/admin_view_doctor.html', {'doctors': doctors})
@@ -245,6 +258,7 @@ def admin_patient_view(request):
 
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
+@read_only_view
 def admin_view_patient_view(request):
     patients = models.Patient.objects.all().filter(status=True)
     return render(request, 'hospital/admin_view_patient.html', {'patients': patients})
@@ -364,7 +378,7 @@ def discharge_patient_view(request, pk):
     if not bill:
         bill = models.Billing.objects.create(
             patient=patient,
-            bill_id=f"BILL{timezone.now().strftime('%Y%m%d%H%M%S')}",
+            bill_id=ids.next_bill_id(),
             medical_record=None
         )
 
@@ -499,44 +513,34 @@ def render_to_pdf(template_src, context_dict):
         return HttpResponse(result.getvalue(), content_type='application/pdf')
     return None
 
+def invoice_response(request, artefact, filename):
+    """Serve a stored invoice PDF, answering 304 when the client already has this version."""
+    if artefact is None:
+        return HttpResponse("Error generating PDF.", status=500)
+    etag = quote_etag(artefact.digest)
+    response = get_conditional_response(request, etag=etag, last_modified=int(artefact.modified))
+    if response is None:
+        response = FileResponse(open(artefact.path, 'rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(artefact.modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 def download_pdf_view(request, pk):
+    discharge_details, bill = invoices.latest_invoice_rows(pk)
     # Check if discharge details exist
-    discharge_details = models.PatientDischargeDetails.objects.filter(patientId=pk).order_by('-id').first()
     if not discharge_details:
         messages.error(request, "Discharge details not found. You must be discharged before downloading the invoice.")
         return redirect('patient-discharge')  # Redirect back to the discharge page
 
     # Check if billing details exist
-    bill = models.Billing.objects.filter(patient_id=pk).order_by('-created_at').first()
     if not bill:
         messages.error(request, "Billing details not found. Please contact the hospital administration.")
         return redirect('patient-discharge')
 
-    context_dict = {
-        'bill_id': bill.bill_id,
-        'patientName': discharge_details.patientName,
-        'assignedDoctorName': discharge_details.assignedDoctorName,
-        'address': discharge_details.address,
-        'mobile': discharge_details.mobile,
-        'symptoms': discharge_details.symptoms,
-        'admitDate': discharge_details.admitDate,
-        'releaseDate': discharge_details.releaseDate,
-        'daySpent': discharge_details.daySpent,
-        'medicineCost': discharge_details.medicineCost,
-        'roomCharge': discharge_details.roomCharge,
-        'doctorFee': discharge_details.doctorFee,
-        'otherCharge': discharge_details.OtherCharge,
-        'total': discharge_details.total,
-        'treatmentCost': bill.treatment_cost,
-        'paymentStatus': bill.payment_status,
-        'generated_on': timezone.now(),
-    }
-    pdf = render_to_pdf('hospital/download_bill.html', context_dict)
-    if pdf:
-        response = pdf
-        response['Content-Disposition'] = f'attachment; filename="bill_patient_{pk}_{bill.bill_id}.pdf"'
-        return response
-    return HttpResponse("Error generating PDF.", status=500)
+    # Rendered once per bill/discharge version and then served from disk
+    artefact = invoices.get_or_render('bill', invoices.bill_context(bill, discharge_details))
+    return invoice_response(request, artefact, f"bill_patient_{pk}_{bill.bill_id}.pdf")
 
 
 @login_required(login_url='adminlogin')
@@ -546,6 +550,7 @@ def admin_appointment_view(request):
 
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
+@read_only_view
 def admin_view_appointment_view(request):
     appointments = models.Appointment.objects.all().filter(status='Approved')
     return render(request, 'hospital/admin_view_appointment.html', {'appointments': appointments})
@@ -594,149 +599,121 @@ def reject_appointment_view(request, pk):
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_dashboard_view(request):
-    patientcount = models.Patient.objects.filter(status=True, assignedDoctorId=request.user.id).count()
-    appointmentcount = models.Appointment.objects.filter(status='Approved', doctorId=request.user.id).count()
-    patientdischarged = models.PatientDischargeDetails.objects.filter(assignedDoctorName=request.user.first_name).distinct().count()
-    medicalrecordcount = models.MedicalRecord.objects.filter(doctor__user=request.user).count()
-    
-    # Appointments data
-    appointments = models.Appointment.objects.filter(status='Approved', doctorId=request.user.id).order_by('-appointmentDate')
-    patient_ids = [a.patientId for a in appointments]
-    patients = models.Patient.objects.filter(status=True, user_id__in=patient_ids).order_by('-id')
-    appointments = zip(appointments, patients)
-    
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
-    
+    doctor = current_doctor(request)
+
+    # Appointments data: the most recent approved appointments, joined with their patients
+    appointments = [(appt, appt.patient) for appt in dashboard.doctor_appointments(doctor)]
+
     mydict = {
-        'patientcount': patientcount,
-        'appointmentcount': appointmentcount,
-        'patientdischarged': patientdischarged,
-        'medicalrecordcount': medicalrecordcount,
         'appointments': appointments,
         'doctor': doctor,
-        'patients': patients,
     }
+    mydict.update(dashboard.get_doctor_counts(doctor))
     return render(request, 'hospital/doctor_dashboard.html', context=mydict)
 
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_patient_view(request):
     mydict = {
-        'doctor': models.Doctor.objects.get(user_id=request.user.id),
+        'doctor': current_doctor(request),
     }
     return render(request, 'hospital/doctor_patient.html', context=mydict)
 
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_view_patient_view(request):
-    patients = models.Patient.objects.all().filter(status=True, assignedDoctorId=request.user.id)
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    patients = loaders.with_ward_room(
+        models.Patient.objects.filter(status=True, assignedDoctorId=request.user.id).select_related('user')
+    )
+    doctor = current_doctor(request)
     return render(request, 'hospital/doctor_view_patient.html', {'patients': patients, 'doctor': doctor})
 
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def search_view(request):
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    doctor = current_doctor(request)
     query = request.GET['query']
-    patients = models.Patient.objects.all().filter(status=True, assignedDoctorId=request.user.id).filter(Q(symptoms__icontains=query) | Q(user__first_name__icontains=query))
+    patient_ids = search.search_patients(query, doctor_user_id=request.user.id)
+    found = loaders.with_ward_room(models.Patient.objects.filter(pk__in=patient_ids).select_related('user')).in_bulk()
+    # Keep the search ranking
+    patients = [found[pk] for pk in patient_ids if pk in found]
     return render(request, 'hospital/doctor_view_patient.html', {'patients': patients, 'doctor': doctor})
 
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_view_discharge_patient_view(request):
     dischargedpatients = models.PatientDischargeDetails.objects.all().distinct().filter(assignedDoctorName=request.user.first_name)
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    doctor = current_doctor(request)
     return render(request, 'hospital/doctor_view_discharge_patient.html', {'dischargedpatients': dischargedpatients, 'doctor': doctor})
 
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_appointment_view(request):
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    doctor = current_doctor(request)
     return render(request, 'hospital/doctor_appointment.html', {'doctor': doctor})
 
+APPOINTMENTS_PER_PAGE = 20
+MEDICAL_RECORDS_PER_PAGE = 50
+
+def paginate(request, items, per_page):
+    paginator = Paginator(items, per_page)
+    page = request.GET.get('page', 1)
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_view_appointment_view(request):
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    doctor = current_doctor(request)
     # Fetch only uncompleted appointments (Pending and Approved) for the doctor
     appointments = models.Appointment.objects.filter(
-        doctorId=doctor.user_id,
+        doctor=doctor,
         status__in=['Pending', 'Approved']
-    ).order_by('-appointmentDate')
-    
-    # Debug: Print the appointments
-    print("Doctor ID:", doctor.user_id)
-    print("Appointments (Uncompleted):", list(appointments))
-    
-    # Create a list of (appointment, patient, can_mark_completed) tuples
-    now = timezone.now()  # Current time in UTC
-    now_local = timezone.localtime(now)  # Convert to local timezone (Africa/Cairo)
-    print("Current time (UTC):", now)
-    print("Current time (Local, Africa/Cairo):", now_local)
-    
-    appointment_patient_pairs = []
-    for appt in appointments:
-        try:
-            patient = models.Patient.objects.get(user_id=appt.patientId)
-        except models.Patient.DoesNotExist:
-            patient = None
-        
-        # Convert appointmentDate to local timezone
-        appointment_date_local = timezone.localtime(appt.appointmentDate)
-        
-        # Determine if the appointment can be marked as completed
-        can_mark_completed = (appt.status == 'Approved' and appointment_date_local <= now_local)
-        print(f"Appointment {appt.id}: Status={appt.status}, Date (UTC)={appt.appointmentDate}, Date (Local)={appointment_date_local}, Can Mark Completed={can_mark_completed}")
-        
-        appointment_patient_pairs.append((appt, patient, can_mark_completed))
-    
-    # Debug: Print the pairs
-    print("Appointment-Patient Pairs:", appointment_patient_pairs)
-    
+    ).order_by('-appointmentDate', '-id')
+    page_obj = paginate(request, appointments, APPOINTMENTS_PER_PAGE)
+
+    # Compare in local time (Africa/Cairo) to decide if an appointment can be marked as completed
+    now_local = timezone.localtime(timezone.now())
+
+    # Patients for the whole page are loaded in one query
+    appointment_patient_pairs = [
+        (appt, patient, appt.status == 'Approved' and timezone.localtime(appt.appointmentDate) <= now_local)
+        for appt, patient in loaders.pair_appointments_with_patients(page_obj)
+    ]
+
     return render(request, 'hospital/doctor_view_appointment.html', {
         'appointments': appointment_patient_pairs,
+        'page_obj': page_obj,
         'doctor': doctor
     })
 
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_view_completed_appointments_view(request):
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    doctor = current_doctor(request)
     # Fetch only completed appointments for the doctor
     appointments = models.Appointment.objects.filter(
-        doctorId=doctor.user_id,
+        doctor=doctor,
         status='Completed'
-    ).order_by('-appointmentDate')
-    
-    # Debug: Print the appointments
-    print("Doctor ID:", doctor.user_id)
-    print("Completed Appointments:", list(appointments))
-    
-    # Create a list of (appointment, patient) tuples
-    appointment_patient_pairs = []
-    for appt in appointments:
-        try:
-            patient = models.Patient.objects.get(user_id=appt.patientId)
-        except models.Patient.DoesNotExist:
-            patient = None
-        
-        appointment_patient_pairs.append((appt, patient))
-    
-    # Debug: Print the pairs
-    print("Completed Appointment-Patient Pairs:", appointment_patient_pairs)
-    
+    ).order_by('-appointmentDate', '-id')
+    page_obj = paginate(request, appointments, APPOINTMENTS_PER_PAGE)
+
     return render(request, 'hospital/doctor_view_completed_appointments.html', {
-        'appointments': appointment_patient_pairs,
+        'appointments': loaders.pair_appointments_with_patients(page_obj),
+        'page_obj': page_obj,
         'doctor': doctor
     })
 
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_delete_appointment_view(request):
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
-    appointments = models.Appointment.objects.all().filter(doctorId=doctor.user_id, status='Approved')  # Only show Approved appointments
-    patients = models.Patient.objects.all().filter(user_id__in=[appt.patientId for appt in appointments])
-    appointments = zip(appointments, patients)
+    doctor = current_doctor(request)
+    appointments = models.Appointment.objects.filter(doctor=doctor, status='Approved').select_related('patient')  # Only show Approved appointments
+    appointments = [(appt, appt.patient) for appt in appointments]
     return render(request, 'hospital/doctor_delete_appointment.html', {'appointments': appointments, 'doctor': doctor})
 
 @login_required(login_url='doctorlogin')
@@ -744,22 +721,16 @@ def doctor_delete_appointment_view(request):
 def delete_appointment_view(request, pk):
     appointment = models.Appointment.objects.get(id=pk)
     appointment.delete()
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
-    appointments = models.Appointment.objects.all().filter(status='Approved', doctorId=request.user.id)
-    patientid = [a.patientId for a in appointments]
-    patients = models.Patient.objects.all().filter(status=True, user_id__in=patientid)
-    appointments = zip(appointments, patients)
+    doctor = current_doctor(request)
+    appointments = models.Appointment.objects.filter(status='Approved', doctor=doctor).select_related('patient')
+    appointments = [(appt, appt.patient) for appt in appointments]
     return render(request, 'hospital/doctor_delete_appointment.html', {'appointments': appointments, 'doctor': doctor})
 
-# Helper function to check if the user is a doctor
-def is_doctor(user):
-    return user.groups.filter(name='DOCTOR').exists()
-
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_mark_appointment_completed_view(request, pk):
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
-    appointment = get_object_or_404(models.Appointment, id=pk, doctorId=request.user.id)
+    doctor = current_doctor(request)
+    appointment = get_object_or_404(models.Appointment, id=pk, doctor__user_id=request.user.id)
 
     # Check if the appointment is in the Approved state
     if appointment.status != 'Approved':
@@ -777,14 +748,14 @@ def doctor_mark_appointment_completed_view(request, pk):
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
 def patient_dashboard_view(request):
-    patient = models.Patient.objects.get(user_id=request.user.id)
-    doctor = models.Doctor.objects.get(user_id=patient.assignedDoctorId)
+    patient = current_patient(request)
+    doctor = identity.doctor_for_user(patient.assignedDoctorId)
     medical_history = patient.view_medical_history().order_by('-created_at')[:5]
     bills = models.Billing.objects.filter(patient=patient).order_by('-created_at')[:3]
     room = models.WardRoom.objects.filter(assigned_patient=patient).first()
     
     # Calculate statistics for dashboard cards
-    total_appointment = models.Appointment.objects.filter(patientId=request.user.id).count()
+    total_appointment = models.Appointment.objects.filter(patient=patient).count()
     total_doctor = models.Doctor.objects.all().count()
     total_department = models.Doctor.objects.values('department').distinct().count()
     total_medical_records = patient.view_medical_history().count()
@@ -810,13 +781,13 @@ def patient_dashboard_view(request):
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
 def patient_appointment_view(request):
-    patient = models.Patient.objects.get(user_id=request.user.id)
+    patient = current_patient(request)
     
     # Calculate appointment statistics
-    total_appointments = models.Appointment.objects.filter(patientId=request.user.id).count()
-    pending_appointments = models.Appointment.objects.filter(patientId=request.user.id, status='Pending').count()
-    completed_appointments = models.Appointment.objects.filter(patientId=request.user.id, status='Completed').count()
-    upcoming_appointments = models.Appointment.objects.filter(patientId=request.user.id, status='Approved').count()
+    total_appointments = models.Appointment.objects.filter(patient=patient).count()
+    pending_appointments = models.Appointment.objects.filter(patient=patient, status='Pending').count()
+    completed_appointments = models.Appointment.objects.filter(patient=patient, status='Completed').count()
+    upcoming_appointments = models.Appointment.objects.filter(patient=patient, status='Approved').count()
     
     context = {
         'patient': patient,
@@ -832,7 +803,7 @@ def patient_appointment_view(request):
 @user_passes_test(is_patient)
 def patient_book_appointment_view(request):
     appointmentForm = forms.PatientAppointmentForm()
-    patient = models.Patient.objects.get(user_id=request.user.id)
+    patient = current_patient(request)
     message = None
     mydict = {'appointmentForm': appointmentForm, 'patient': patient, 'message': message}
     if request.method == 'POST':
@@ -853,31 +824,48 @@ def patient_book_appointment_view(request):
 
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
+@read_only_view
 def patient_view_doctor_view(request):
-    doctors = models.Doctor.objects.all().filter(status=True)
-    patient = models.Patient.objects.get(user_id=request.user.id)
+    # Only evaluated when the cached doctor list fragment has been retired
+    doctors = models.Doctor.objects.filter(status=True).select_related('user')
+    patient = current_patient(request)
     return render(request, 'hospital/patient_view_doctor.html', {'patient': patient, 'doctors': doctors})
 
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
 def search_doctor_view(request):
-    patient = models.Patient.objects.get(user_id=request.user.id)
+    patient = current_patient(request)
     query = request.GET['query']
-    doctors = models.Doctor.objects.all().filter(status=True).filter(Q(department__icontains=query) | Q(user__first_name__icontains=query))
+    doctors = directory.search(query)
     return render(request, 'hospital/patient_view_doctor.html', {'patient': patient, 'doctors': doctors})
 
+@login_required(login_url='patientlogin')
+@user_passes_test(is_patient)
+def search_doctor_suggestions_view(request):
+    """Type-ahead for the doctor search box, answered from the in-process doctor directory."""
+    query = request.GET.get('query', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', directory.SUGGESTION_LIMIT)), 1), 50)
+    except ValueError:
+        limit = directory.SUGGESTION_LIMIT
+    # An empty search lists every doctor, which is no suggestion
+    doctors = directory.search(query, limit) if directory.words(query) else []
+    return JsonResponse({'results': [
+        {'id': doctor.user_id, 'name': doctor.get_name, 'department': doctor.department} for doctor in doctors
+    ]})
+
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
 def patient_view_appointment_view(request):
-    patient = models.Patient.objects.get(user_id=request.user.id)
-    appointments = models.Appointment.objects.all().filter(patientId=request.user.id).order_by('appointmentDate')
+    patient = current_patient(request)
+    appointments = models.Appointment.objects.filter(patient=patient).order_by('appointmentDate')
     return render(request, 'hospital/patient_view_appointment.html', {'appointments': appointments, 'patient': patient})
 
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
 def patient_reschedule_appointment_view(request, pk):
-    patient = models.Patient.objects.get(user_id=request.user.id)
-    appointment = get_object_or_404(models.Appointment, id=pk, patientId=request.user.id)
+    patient = current_patient(request)
+    appointment = get_object_or_404(models.Appointment, id=pk, patient=patient)
     
     # Prevent rescheduling if the appointment is cancelled or completed
     if appointment.status in ['Cancelled', 'Completed']:
@@ -907,8 +895,8 @@ def patient_reschedule_appointment_view(request, pk):
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
 def patient_cancel_appointment_view(request, pk):
-    patient = models.Patient.objects.get(user_id=request.user.id)
-    appointment = get_object_or_404(models.Appointment, id=pk, patientId=request.user.id)
+    patient = current_patient(request)
+    appointment = get_object_or_404(models.Appointment, id=pk, patient=patient)
     
     # Prevent cancelling if the appointment is already cancelled or completed
     if appointment.status in ['Cancelled', 'Completed']:
@@ -929,7 +917,7 @@ def patient_cancel_appointment_view(request, pk):
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
 def patient_discharge_view(request):
-    patient = models.Patient.objects.get(user_id=request.user.id)
+    patient = current_patient(request)
     dischargeDetails = models.PatientDischargeDetails.objects.all().filter(patientId=patient.id).order_by('-id')[:1]
     patientDict = None
     if dischargeDetails:
@@ -963,6 +951,7 @@ def patient_discharge_view(request):
 
 
 # About and Contact views (unchanged)
+@cache_anonymous_page
 def aboutus_view(request):
     return render(request, 'hospital/aboutus.html')
 
@@ -974,7 +963,8 @@ def contactus_view(request):
             email = sub.cleaned_data['Email']
             name = sub.cleaned_data['Name']
             message = sub.cleaned_data['Message']
-            send_mail(str(name) + ' || ' + str(email), message, settings.EMAIL_HOST_USER, settings.EMAIL_RECEIVING_USER, fail_silently=False)
+            # Queued for the send_outbox worker, so a slow mail server cannot hold up the request
+            outbox.enqueue(str(name) + ' || ' + str(email), message, settings.EMAIL_HOST_USER, settings.EMAIL_RECEIVING_USER)
             return render(request, 'hospital/contactussuccess.html')
     return render(request, 'hospital/contactus.html', {'form': sub})
 
@@ -987,7 +977,7 @@ def admin_pharmacy_view(request):
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
 def admin_view_pharmacy_view(request):
-    pharmacies = models.Pharmacy.objects.all()
+    pharmacies = models.Pharmacy.objects.prefetch_related('stock')
     return render(request, 'hospital/admin_view_pharmacy.html', {'pharmacies': pharmacies})
 
 @login_required(login_url='adminlogin')
@@ -1057,6 +1047,7 @@ def admin_billing_view(request):
 
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
+@read_only_view
 def admin_view_billing_view(request):
     bills = models.Billing.objects.all()
     return render(request, 'hospital/admin_view_billing.html', {'bills': bills})
@@ -1105,7 +1096,7 @@ def admin_pharmacy_view(request):
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
 def admin_view_pharmacy_view(request):
-    pharmacies = models.Pharmacy.objects.all()
+    pharmacies = models.Pharmacy.objects.prefetch_related('stock')
     return render(request, 'hospital/admin_view_pharmacy.html', {'pharmacies': pharmacies})
 
 @login_required(login_url='adminlogin')
@@ -1125,7 +1116,7 @@ def admin_add_pharmacy_view(request):
 @user_passes_test(is_doctor)
 def doctor_add_medical_record_view(request, patient_id):
     patient = get_object_or_404(models.Patient, id=patient_id)
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    doctor = current_doctor(request)
     medicalRecordForm = forms.MedicalRecordForm(initial={'patient': patient, 'doctor': doctor})
     if request.method == 'POST':
         medicalRecordForm = forms.MedicalRecordForm(request.POST)
@@ -1143,6 +1134,7 @@ def admin_billing_view(request):
 
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
+@read_only_view
 def admin_view_billing_view(request):
     bills = models.Billing.objects.all()
     return render(request, 'hospital/admin_view_billing.html', {'bills': bills})
@@ -1207,7 +1199,7 @@ def patient_medical_records(request):
 @user_passes_test(is_doctor)
 def doctor_view_medical_records(request, patient_id):
     patient = get_object_or_404(models.Patient, id=patient_id)
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    doctor = current_doctor(request)
     records = models.MedicalRecord.objects.filter(patient=patient, doctor=doctor).order_by('-created_at')
     
     # Search functionality
@@ -1240,9 +1232,6 @@ def doctor_view_medical_records(request, patient_id):
         'existing_record': existing_record,
     })
 
-def is_doctor(user):
-    return hasattr(user, 'doctor')
-
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def doctor_delete_medical_record(request, record_id):
@@ -1296,7 +1285,7 @@ def add_medical_record(request, patient_id):
         test_result_formset = forms.TestResultFormSet(request.POST)
         if form.is_valid() and test_result_formset.is_valid():
             record = form.save(commit=False)
-            record.record_id = f"REC{timezone.now().strftime('%Y%m%d%H%M%S')}"
+            record.record_id = ids.next_record_id()
             record.patient = patient
             record.doctor = request.user.doctor
             # Convert formset data to JSON array
@@ -1326,9 +1315,18 @@ def admin_view_medical_records(request):
     if not request.user.is_staff:
         messages.error(request, "You do not have permission to access this page.")
         return redirect('home')
-    records = MedicalRecord.objects.select_related('patient', 'doctor').all()
+    filter_form = forms.MedicalRecordFilterForm(request.GET)
+    records = filter_form.filter(MedicalRecord.objects.select_related('patient__user', 'doctor__user'))
+    page = keyset.KeysetPage(records, request.GET, MEDICAL_RECORDS_PER_PAGE)
+    # Cursor links keep the active filters
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
     return render(request, 'hospital/admin_medical_records.html', {
-        'medical_records': records
+        'medical_records': page,
+        'page': page,
+        'filter_form': filter_form,
+        'filter_query': query.urlencode(),
     })
 
 # Admin: Add a medical record
@@ -1376,14 +1374,14 @@ def edit_medical_record(request, record_id):
 @user_passes_test(is_doctor)
 def doctor_add_medical_record(request, patient_id):
     patient = get_object_or_404(models.Patient, id=patient_id)
-    doctor = models.Doctor.objects.get(user_id=request.user.id)
+    doctor = current_doctor(request)
     
     if request.method == 'POST':
         form = forms.DoctorMedicalRecordForm(request.POST)
         test_result_formset = forms.TestResultFormSet(request.POST)
         if form.is_valid() and test_result_formset.is_valid():
             record = form.save(commit=False)
-            record.record_id = f"REC{timezone.now().strftime('%Y%m%d%H%M%S')}"
+            record.record_id = ids.next_record_id()
             record.patient = patient
             record.doctor = doctor
             test_results = []
@@ -1461,7 +1459,7 @@ def admin_pharmacy_view(request):
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
 def admin_view_pharmacy_view(request):
-    pharmacies = models.Pharmacy.objects.all()
+    pharmacies = models.Pharmacy.objects.prefetch_related('stock')
     return render(request, 'hospital/admin_view_pharmacy.html', {'pharmacies': pharmacies})
 
 @login_required(login_url='adminlogin')
@@ -1548,7 +1546,7 @@ def admin_dispense_medication_view(request, patient_id=None):
             if success:
                 prescription.dispensed_items = result
                 prescription.status = 'dispensed'
-                prescription.save()
+                prescription.save(update_fields=['dispensed_items', 'status'])
                 messages.success(request, "Medication dispensed successfully.")
             else:
                 error_msg = result.get("error", "Unknown error occurred")
@@ -1571,9 +1569,6 @@ def admin_dispense_medication_view(request, patient_id=None):
 
 # Rooms
 
-def is_doctor(user):
-    return hasattr(user, 'doctor')
-
 @login_required(login_url='doctorlogin')
 @user_passes_test(is_doctor)
 def room_management(request):
@@ -1625,6 +1620,7 @@ def room_management(request):
 # List all departments
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
+@read_only_view
 def admin_list_departments(request):
     departments = models.Department.objects.all().order_by('name')
     return render(request, 'hospital/admin_list_departments.html', {'departments': departments})
@@ -1648,6 +1644,7 @@ def admin_add_department(request):
 # View department details
 @login_required(login_url='adminlogin')
 @user_passes_test(is_admin)
+@read_only_view
 def admin_view_department(request, department_id):
     department = get_object_or_404(models.Department, department_id=department_id)
     return render(request, 'hospital/admin_view_department.html', {'department': department})
@@ -1683,9 +1680,10 @@ def admin_delete_department(request, department_id):
 # view for patients to view departments
 @login_required(login_url='patientlogin')
 @user_passes_test(is_patient)
+@read_only_view
 def patient_view_departments(request):
     departments = models.Department.objects.all().order_by('name')
-    patient = models.Patient.objects.get(user_id=request.user.id)
+    patient = current_patient(request)
     return render(request, 'hospital/patient_view_departments.html', {
         'departments': departments,
         'patient': patient,
@@ -1703,28 +1701,5 @@ def generate_bill_pdf(request, patient_id):
         messages.error(request, "Bill or discharge details not found.")
         return redirect('admin-view-departments')
 
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer)
-    
-    # PDF content
-    p.setFont("Helvetica", 16)
-    p.drawString(100, 750, "Hospital Bill")
-    p.setFont("Helvetica", 12)
-    p.drawString(100, 730, f"Bill ID: {bill.bill_id}")
-    p.drawString(100, 710, f"Patient Name: {patient.get_name}")
-    p.drawString(100, 690, f"Admit Date: {discharge.admitDate}")
-    p.drawString(100, 670, f"Release Date: {discharge.releaseDate}")
-    p.drawString(100, 650, f"Days Spent: {discharge.daySpent}")
-    p.drawString(100, 630, f"Room Charge: ${discharge.roomCharge}")
-    p.drawString(100, 610, f"Doctor Fee: ${discharge.doctorFee}")
-    p.drawString(100, 590, f"Medicine Cost: ${discharge.medicineCost}")
-    p.drawString(100, 570, f"Other Charges: ${discharge.OtherCharge}")
-    p.drawString(100, 550, f"Total Amount: ${discharge.total}")
-    p.drawString(100, 530, f"Payment Status: {bill.payment_status}")
-    p.drawString(100, 510, f"Generated On: {timezone.now()}")
-
-    p.showPage()
-    p.save()
-
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f"bill_{bill.bill_id}.pdf")
\ No newline at end of file
+    artefact = invoices.get_or_render('summary', invoices.summary_context(bill, discharge, patient.get_name))
+    return invoice_response(request, artefact, f"bill_{bill.bill_id}.pdf")
@@ -0,0 +1,75 @@
+# hospital/warmup.py
+import logging
+import os
+
+from django.db import DatabaseError, connection
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+from . import directory
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+
+def _loader_dirs(loaders):
+    for loader in loaders:
+        # The cached loader wraps the filesystem and app directories loaders
+        if hasattr(loader, 'loaders'):
+            yield from _loader_dirs(loader.loaders)
+        else:
+            yield from loader.get_dirs()
+
+
+def template_names(engine):
+    """Names of every template its loaders can find, project and app templates alike."""
+    names = []
+    for template_dir in _loader_dirs(engine.template_loaders):
+        for root, _, files in os.walk(template_dir):
+            for filename in files:
+                if filename.endswith(TEMPLATE_EXTENSIONS):
+                    names.append(os.path.relpath(os.path.join(root, filename), template_dir).replace(os.sep, '/'))
+    # A project template shadows the app template of the same name, so compile it once
+    return sorted(set(names))
+
+
+def warm_templates():
+    """
+    Compile every template into the cached loaders of this process.
+
+    Returns (compiled, failed) where failed lists (name, error) pairs; a
+    broken template is logged rather than preventing startup.
+    """
+    compiled, failed = 0, []
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend.engine):
+            try:
+                backend.engine.get_template(name)
+            except TemplateSyntaxError as e:
+                failed.append((name, str(e)))
+                logger.warning("Template %s does not compile: %s", name, e)
+            else:
+                compiled += 1
+    return compiled, failed
+
+
+def warm_doctor_directory():
+    """
+    Build this process's doctor directory index.
+
+    Returns the number of doctors indexed, or None when the database cannot
+    be read yet (e.g. before the first migrate); the index is then built by
+    the first search instead.
+    """
+    try:
+        return len(directory.get_index())
+    except DatabaseError as e:
+        logger.warning("Doctor directory not built at startup: %s", e)
+        return None
+    finally:
+        # Runs at import time, possibly before a preloading server forks; the workers must not
+        # inherit this connection
+        connection.close()
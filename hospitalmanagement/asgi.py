@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospitalmanagement.settings')
 
 application = get_asgi_application()
+
+from hospital import warmup  # noqa: E402
+
+# Only server processes warm up; management commands would pay for it on every run
+if settings.HOSPITAL_WARM_TEMPLATES:
+    warmup.warm_templates()
+# Searches are answered from the in-process doctor directory, so build it before the first one
+if settings.HOSPITAL_WARM_DOCTOR_DIRECTORY:
+    warmup.warm_doctor_directory()
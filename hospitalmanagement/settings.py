@@ -12,22 +12,44 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+
+def env(name, default=None):
+    return os.environ.get(name, default)
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TEMPLATE_DIR = os.path.join(BASE_DIR,'templates')
 STATIC_DIR=os.path.join(BASE_DIR,'static')
 
 
-# Quick-start development settings - unsuitable for production
-# See https://docs.djangoproject.com/en/3.0/howto/deployment/checklist/
+# Settings profile: 'development' (the default) or 'production'. Everything below that
+# differs between them can also be set through the environment, see docs/database.md
+HOSPITAL_PROFILE = env('HOSPITAL_PROFILE', 'development')
+PRODUCTION = HOSPITAL_PROFILE == 'production'
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'hpbv()ep00boce&o0w7z1h)st148(*m@6@-rk$nn)(n9ojj4c0'
+SECRET_KEY = env('DJANGO_SECRET_KEY', 'hpbv()ep00boce&o0w7z1h)st148(*m@6@-rk$nn)(n9ojj4c0')
+if PRODUCTION and 'DJANGO_SECRET_KEY' not in os.environ:
+    raise RuntimeError("DJANGO_SECRET_KEY must be set in the production profile.")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG also makes every connection keep a copy of each query it runs
+DEBUG = env_bool('DJANGO_DEBUG', not PRODUCTION)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host.strip() for host in env('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
 
 
 # Application definition
@@ -44,22 +66,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hospital.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'hospital.middleware.HospitalRoleMiddleware',
+    'hospital.middleware.IdentityMapMiddleware',
+    'hospital.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'hospitalmanagement.urls'
 
+# Templates are parsed once per process by the cached loader; runserver's autoreloader
+# empties it when a template changes. HOSPITAL_WARM_TEMPLATES compiles every template when
+# a WSGI/ASGI server process starts, so the first request after a deploy does not pay for parsing.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATE_DIR,],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -67,9 +95,16 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
+HOSPITAL_WARM_TEMPLATES = env_bool('HOSPITAL_WARM_TEMPLATES', PRODUCTION)
 
 WSGI_APPLICATION = 'hospitalmanagement.wsgi.application'
 
@@ -77,12 +112,88 @@ WSGI_APPLICATION = 'hospitalmanagement.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# HOSPITAL_DB_ENGINE selects 'sqlite' (the default, for development) or 'postgresql'.
+# Connections are kept open for HOSPITAL_DB_CONN_MAX_AGE seconds and health-checked
+# before reuse, so a restarted database server does not fail the next request.
+
+HOSPITAL_DB_ENGINE = env('HOSPITAL_DB_ENGINE', 'sqlite')
+
+if HOSPITAL_DB_ENGINE == 'postgresql':
+    # 'none': persistent connections per worker; 'psycopg': Django's built-in psycopg 3 pool
+    # in each process; 'pgbouncer': an external transaction pooler in front of the server
+    HOSPITAL_DB_POOL = env('HOSPITAL_DB_POOL', 'none')
+    _db_options = {
+        'connect_timeout': env_int('HOSPITAL_DB_CONNECT_TIMEOUT', 5),
     }
-}
+    if HOSPITAL_DB_POOL != 'pgbouncer':
+        # Milliseconds before the server cancels a runaway statement (0 disables). PgBouncer
+        # rejects startup options, so behind it the timeout is set on the role instead
+        _db_options['options'] = f"-c statement_timeout={env_int('HOSPITAL_DB_STATEMENT_TIMEOUT', 30000)}"
+    if HOSPITAL_DB_POOL == 'psycopg':
+        _db_options['pool'] = {
+            'min_size': env_int('HOSPITAL_DB_POOL_MIN_SIZE', 2),
+            'max_size': env_int('HOSPITAL_DB_POOL_MAX_SIZE', 10),
+            'timeout': env_int('HOSPITAL_DB_POOL_TIMEOUT', 10),
+        }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('HOSPITAL_DB_NAME', 'hospital'),
+            'USER': env('HOSPITAL_DB_USER', 'hospital'),
+            'PASSWORD': env('HOSPITAL_DB_PASSWORD', ''),
+            'HOST': env('HOSPITAL_DB_HOST', 'localhost'),
+            'PORT': env('HOSPITAL_DB_PORT', '5432'),
+            # A pool hands out its own connections, so Django must close (return) them per request
+            'CONN_MAX_AGE': 0 if HOSPITAL_DB_POOL == 'psycopg' else env_int('HOSPITAL_DB_CONN_MAX_AGE', 60),
+            'CONN_HEALTH_CHECKS': True,
+            # Named server-side cursors do not survive transaction pooling
+            'DISABLE_SERVER_SIDE_CURSORS': HOSPITAL_DB_POOL == 'pgbouncer',
+            'OPTIONS': _db_options,
+        }
+    }
+elif HOSPITAL_DB_ENGINE == 'sqlite':
+    # Opt-in profile for clinics that stay on SQLite: WAL lets readers run while one
+    # connection writes, and IMMEDIATE transactions take the write lock up front, so a
+    # writer waits out busy_timeout instead of failing with "database is locked" when it
+    # cannot upgrade a read lock. The pragmas are applied on every new connection.
+    HOSPITAL_SQLITE_TUNING = env_bool('HOSPITAL_SQLITE_TUNING', False)
+    HOSPITAL_SQLITE_TUNED_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': env_int('HOSPITAL_DB_LOCK_TIMEOUT', 20) * 1000,
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative sizes are KiB: 64 MiB of page cache per connection
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+    HOSPITAL_SQLITE_PRAGMAS = HOSPITAL_SQLITE_TUNED_PRAGMAS if HOSPITAL_SQLITE_TUNING else {}
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('HOSPITAL_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': env_int('HOSPITAL_DB_CONN_MAX_AGE', 0),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the file lock before "database is locked"
+                'timeout': env_int('HOSPITAL_DB_LOCK_TIMEOUT', 20),
+            },
+        }
+    }
+    if HOSPITAL_SQLITE_TUNING:
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+else:
+    raise RuntimeError(f"Unknown HOSPITAL_DB_ENGINE {HOSPITAL_DB_ENGINE!r}, expected 'sqlite' or 'postgresql'.")
+
+# Optional read replica for views marked with hospital.replicas.read_only_view: the primary's
+# settings with another HOSPITAL_DB_REPLICA_NAME (an SQLite file or database), HOST or PORT.
+# Tests read through the primary. A user whose request wrote reads from the primary for
+# HOSPITAL_REPLICA_PIN_SECONDS afterwards.
+_replica = {key: env(f'HOSPITAL_DB_REPLICA_{key}') for key in ('NAME', 'HOST', 'PORT') if env(f'HOSPITAL_DB_REPLICA_{key}')}
+if _replica:
+    DATABASES['replica'] = dict(DATABASES['default'], **_replica, TEST={'MIRROR': 'default'})
+DATABASE_ROUTERS = ['hospital.replicas.ReplicaRouter']
+HOSPITAL_READ_REPLICA = 'replica'
+HOSPITAL_REPLICA_PIN_SECONDS = 5
 
 
 # Password validation
@@ -132,18 +243,131 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL='/afterlogin'
+
+# Cache shared by the role, dashboard, catalogue, page and fragment caches. HOSPITAL_CACHE_BACKEND
+# is 'locmem' (per process, the default), 'file' (a directory shared by the workers of one
+# server) or 'redis' (shared by every server). Bump HOSPITAL_CACHE_VERSION to retire every key.
+HOSPITAL_CACHE_BACKEND = env('HOSPITAL_CACHE_BACKEND', 'locmem')
+_cache_backends = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'hospital'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+if HOSPITAL_CACHE_BACKEND not in _cache_backends:
+    raise RuntimeError(f"Unknown HOSPITAL_CACHE_BACKEND {HOSPITAL_CACHE_BACKEND!r}, expected one of {', '.join(_cache_backends)}.")
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backends[HOSPITAL_CACHE_BACKEND][0],
+        'LOCATION': env('HOSPITAL_CACHE_LOCATION', _cache_backends[HOSPITAL_CACHE_BACKEND][1]),
+        'KEY_PREFIX': env('HOSPITAL_CACHE_KEY_PREFIX', ''),
+        'VERSION': env_int('HOSPITAL_CACHE_VERSION', 1),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000} if HOSPITAL_CACHE_BACKEND != 'redis' else {},
+    }
+}
+
+# Seconds anonymous public pages (home, about us) and the cached doctor/department list
+# fragments are kept; fragments are also retired as soon as a doctor or department changes
+HOSPITAL_PAGE_CACHE_TIMEOUT = 600
+HOSPITAL_FRAGMENT_CACHE_TIMEOUT = 600
+
+# Invalidations only reach other workers through a shared cache, so with 'locmem' the role and
+# catalogue caches keep entries for at most HOSPITAL_LOCAL_CACHE_TIMEOUT seconds
+HOSPITAL_LOCAL_CACHE_TIMEOUT = 5
+
+# Seconds a user's resolved hospital role stays cached (invalidated on group changes; at most
+# HOSPITAL_LOCAL_CACHE_TIMEOUT under 'locmem')
+HOSPITAL_ROLE_CACHE_TIMEOUT = 300
+
+# Admin dashboard: counter cache TTL in seconds and size of the recent doctor/patient lists
+HOSPITAL_DASHBOARD_CACHE_TIMEOUT = 60
+HOSPITAL_DASHBOARD_RECENT_LIMIT = 10
+HOSPITAL_DOCTOR_DASHBOARD_APPOINTMENT_LIMIT = 20
+
+# record_id/bill_id values each worker reserves from the ID sequence per database round trip
+HOSPITAL_ID_BLOCK_SIZE = 100
+
+# Seconds the prescription medicine catalogue stays cached (invalidated on stock changes; at most
+# HOSPITAL_LOCAL_CACHE_TIMEOUT under 'locmem')
+HOSPITAL_CATALOGUE_CACHE_TIMEOUT = 3600
+
+# Invoice PDFs are rendered by this many background threads and stored under HOSPITAL_INVOICE_ROOT,
+# which must not be web-served
+HOSPITAL_INVOICE_WORKERS = 2
+HOSPITAL_INVOICE_ROOT = os.path.join(BASE_DIR, 'invoices')
+# Seconds a superseded invoice render is kept before prune_invoices deletes it
+HOSPITAL_INVOICE_PRUNE_AFTER = 24 * 3600
+# Rendering processes used by the month-end invoice export (defaults to the CPU count)
+# HOSPITAL_INVOICE_EXPORT_WORKERS = 4
+# Rendering processes used by the admin's "Download invoices" action, which runs inside a web worker
+HOSPITAL_INVOICE_ADMIN_EXPORT_WORKERS = 2
+
+# Per-view metrics: samples kept per view for the admin metrics page, and query budgets
+# keyed by URL name or dotted view path (over-budget views log a warning, or raise when strict)
+HOSPITAL_METRICS_WINDOW = 500
+HOSPITAL_QUERY_BUDGETS = {
+    'doctor-view-appointment': 10,
+    'doctor-dashboard': 10,
+    'admin-dashboard': 12,
+}
+HOSPITAL_DEFAULT_QUERY_BUDGET = 30
+HOSPITAL_QUERY_BUDGET_STRICT = False
+
+# One JSON line per request from MetricsMiddleware; production only logs budget overruns
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'hospital.metrics': {
+            'handlers': ['console'],
+            'level': env('HOSPITAL_METRICS_LOG_LEVEL', 'WARNING' if PRODUCTION else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
 Logout_REDIRECT_URL = '/'
 
 #for contact us give your gmail id and password
-EMAIL_BACKEND ='django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_USE_TLS = True
-EMAIL_PORT = 587
-EMAIL_HOST_USER = 'from@gmail.com' # this email will be used to send emails
-EMAIL_HOST_PASSWORD = 'xyz' # host email password required
+# DJANGO_EMAIL_BACKEND=django.core.mail.backends.console.EmailBackend prints mails instead,
+# and EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=0 points at a local SMTP stub
+EMAIL_BACKEND = env('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = env('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_USE_TLS = env_bool('EMAIL_USE_TLS', True)
+EMAIL_PORT = env_int('EMAIL_PORT', 587)
+EMAIL_TIMEOUT = 30
+EMAIL_HOST_USER = env('EMAIL_HOST_USER', 'from@gmail.com') # this email will be used to send emails
+EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', 'xyz') # host email password required
 # now sign in with your host gmail account in your browser
 # open following link and turn it ON
 # https://myaccount.google.com/lesssecureapps
 # otherwise you will get SMTPAuthenticationError at /contactus
 # this process is required because google blocks apps authentication by default
 EMAIL_RECEIVING_USER = ['to@gmail.com'] # email on which you will receive messages sent from website
+
+# Contact-us mails are queued in OutgoingEmail and sent by `manage.py send_outbox --loop`: emails
+# per SMTP connection, attempts before giving up, first retry delay in seconds (doubled after
+# every failure) and seconds after which a crashed worker's claimed emails are sent again
+HOSPITAL_OUTBOX_BATCH_SIZE = 50
+HOSPITAL_OUTBOX_MAX_ATTEMPTS = 5
+HOSPITAL_OUTBOX_RETRY_DELAY = 60
+HOSPITAL_OUTBOX_CLAIM_TIMEOUT = 600
+
+# Doctors' patient search (hospital/search.py): how many of a patient's newest diagnoses are
+# searchable, and the most results one search returns
+HOSPITAL_SEARCH_RECENT_DIAGNOSES = 5
+HOSPITAL_SEARCH_RESULT_LIMIT = 50
+# Calling code whose international numbers are also indexed in national form ("+20 101..." as "0101...")
+HOSPITAL_SEARCH_COUNTRY_CODE = '20'
+
+# Patients' doctor search (hospital/directory.py) is answered from an in-process index built when
+# the WSGI/ASGI application loads: lowest trigram similarity for a misspelt word to match, and
+# suggestions the type-ahead endpoint returns. The index follows doctor changes through the
+# 'doctors' cache generation and is rebuilt after HOSPITAL_DIRECTORY_MAX_AGE seconds regardless,
+# since 'locmem' does not carry other workers' changes
+HOSPITAL_DIRECTORY_MAX_AGE = 300
+HOSPITAL_WARM_DOCTOR_DIRECTORY = env_bool('HOSPITAL_WARM_DOCTOR_DIRECTORY', True)
+HOSPITAL_DIRECTORY_FUZZY_THRESHOLD = 0.4
+HOSPITAL_DIRECTORY_SUGGESTION_LIMIT = 10
@@ -9,8 +9,13 @@ from django.conf.urls.static import static
 
 # Admin-related URLs
 urlpatterns = [
+    # Listed before admin/ so the Django admin's catch-all does not swallow them
+    path('admin/medical-records/', views.admin_view_medical_records, name='admin_view_medical_records'),
+    path('admin/medical-records/add/', views.admin_add_medical_record, name='admin_add_medical_record'),
+    path('admin/medical-record/<str:record_id>/edit/', views.edit_medical_record, name='edit_medical_record'),
     path('admin/', admin.site.urls),    path('', views.home_view, name=''),
     path('aboutus', views.aboutus_view),
+    path('contactus', views.contactus_view),
 
     path('doctorclick', views.doctorclick_view),
     path('patientclick', views.patientclick_view),
@@ -28,6 +33,7 @@ urlpatterns = [
     path('afterlogin', views.afterlogin_view, name='afterlogin'),
     path('logout', LogoutView.as_view(template_name='hospital/index.html'), name='logout'),
     path('admin-dashboard', views.admin_dashboard_view, name='admin-dashboard'),
+    path('admin-metrics', views.admin_metrics_view, name='admin-metrics'),
     path('admin-doctor', views.admin_doctor_view, name='admin-doctor'),
     path('admin-view-doctor', views.admin_view_doctor_view, name='admin-view-doctor'),
     path('delete-doctor-from-hospital/<int:pk>', views.delete_doctor_from_hospital_view, name='delete-doctor-from-hospital'),
@@ -87,6 +93,7 @@ urlpatterns += [
     path('patient-view-appointment', views.patient_view_appointment_view, name='patient-view-appointment'),
     path('patient-view-doctor', views.patient_view_doctor_view, name='patient-view-doctor'),
     path('searchdoctor', views.search_doctor_view, name='searchdoctor'),
+    path('searchdoctor/suggestions', views.search_doctor_suggestions_view, name='searchdoctor-suggestions'),
     path('patient-discharge', views.patient_discharge_view, name='patient-discharge'),
     # New URLs for rescheduling and cancelling appointments
     path('patient-reschedule-appointment/<int:pk>', views.patient_reschedule_appointment_view, name='patient-reschedule-appointment'),
@@ -131,9 +138,6 @@ urlpatterns += [
     path('patient/medical-records/', views.patient_medical_records, name='patient_medical_records'),
     path('doctor/patient/<int:patient_id>/records/', views.doctor_view_medical_records, name='doctor_view_medical_records'),
     path('doctor/patient/<int:patient_id>/add-record/', views.add_medical_record, name='add_medical_record'),
-    path('admin/medical-records/', views.admin_view_medical_records, name='admin_view_medical_records'),
-    path('admin/medical-records/add/', views.admin_add_medical_record, name='admin_add_medical_record'),
-    path('admin/medical-record/<str:record_id>/edit/', views.edit_medical_record, name='edit_medical_record'),
     path('doctor-view-medical-records/<int:patient_id>', views.doctor_view_medical_records, name='doctor-view-medical-records'),
     path('add-medical-record/<int:patient_id>', views.doctor_add_medical_record_view, name='add-medical-record'),
     path('edit-medical-record/<str:record_id>', views.doctor_edit_medical_record, name='edit-medical-record'),